@@ -0,0 +1,29 @@
+"""Fixtures shared by the benchmarks."""
+from __future__ import annotations
+
+import tracemalloc
+from typing import Callable, Any
+
+import pytest
+
+
+@pytest.fixture
+def record_allocations(benchmark) -> Callable[[Callable[[], Any]], None]:
+    """Records the memory allocated by one call of a function in the benchmark's extra info."""
+
+    def record(fn: Callable[[], Any]) -> None:
+        tracemalloc.start()
+        try:
+            before = tracemalloc.take_snapshot()
+            fn()
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        allocated = [s for s in after.compare_to(before, "filename") if s.size_diff > 0]
+        benchmark.extra_info["allocated_blocks"] = sum(s.count_diff for s in allocated)
+        benchmark.extra_info["allocated_bytes"] = sum(s.size_diff for s in allocated)
+        benchmark.extra_info["peak_bytes"] = peak
+
+    return record
@@ -0,0 +1,138 @@
+"""Benchmarks for the hot path that runs when market data changes and at every quarter-hour."""
+from __future__ import annotations
+
+from datetime import date, timedelta, tzinfo
+from typing import NamedTuple, Callable, Any
+
+import pytest
+
+from custom_components.omie.const import PRICE_ATTRIBUTES_FULL, PRICE_ATTRIBUTES_SUMMARY, RESOLUTION_HOURLY
+from custom_components.omie.sensor import _price_attributes
+from custom_components.omie.series import QuarterHourSeries, local_midnight, QUARTER_HOUR, HOUR
+from custom_components.omie.tariff import Tariff
+from custom_components.omie.transitions import PriceCondition
+from custom_components.omie.view import OMIEMarketView, LocalizedDay
+
+from tests.market_data import FixedCoordinator, market_window, spot_results, cet_quarter_hours, forecast_view
+
+_TARIFF = Tariff(table="pt_tri_daily", multiplier=1.15, adder=9.0, access=(95.0, 40.0, 10.0), vat=0.23)
+
+_CONDITIONS = (PriceCondition(key="below_100", threshold=100.0), PriceCondition(key="cheapest_25", cheapest_share=25))
+
+
+class _Update(NamedTuple):
+    """What an entity computes when the market data changes."""
+    compute: Callable[[OMIEMarketView, tzinfo, date], Any]
+    """Computes the entity's state from a view that has not cached anything yet."""
+
+    check: Callable[[Any, tzinfo, date], bool]
+    """Whether what was computed is plausible."""
+
+    forecast: bool = False
+    """Whether the view forecasts the prices that are not published yet."""
+
+
+def _local_length(market_day: date, tz: tzinfo) -> timedelta:
+    return local_midnight(market_day + timedelta(days=1), tz) - local_midnight(market_day, tz)
+
+
+_UPDATES = {
+    "price": _Update(
+        compute=lambda view, tz, day: _price_attributes(view.localized("pt_spot_price", tz, day), PRICE_ATTRIBUTES_FULL),
+        check=lambda attributes, tz, day: len(attributes["today_hours"]) == _local_length(day, tz) // QUARTER_HOUR),
+    "price_summary": _Update(
+        compute=lambda view, tz, day: _price_attributes(view.localized("pt_spot_price", tz, day), PRICE_ATTRIBUTES_SUMMARY),
+        check=lambda attributes, tz, day: "today_hours" not in attributes),
+    "price_hourly": _Update(
+        compute=lambda view, tz, day: _price_attributes(
+            view.localized("pt_spot_price", tz, day, resolution=RESOLUTION_HOURLY), PRICE_ATTRIBUTES_FULL),
+        check=lambda attributes, tz, day: ("today_hours" not in attributes
+                                           and len(attributes["today_hourly"]) == _local_length(day, tz) // HOUR)),
+    "tariff": _Update(
+        compute=lambda view, tz, day: _price_attributes(view.localized("pt_spot_price", tz, day, _TARIFF), PRICE_ATTRIBUTES_FULL),
+        check=lambda attributes, tz, day: attributes["today_average"] is not None),
+    "forecast": _Update(
+        compute=lambda view, tz, day: _price_attributes(view.localized("pt_spot_price", tz, day), PRICE_ATTRIBUTES_FULL),
+        check=lambda attributes, tz, day: bool(attributes["forecast_hours"]),
+        forecast=True),
+    "transitions": _Update(
+        compute=lambda view, tz, day: view.transitions("pt_spot_price", tz, _CONDITIONS),
+        check=lambda transitions, tz, day: bool(transitions.transitions)),
+}
+"""Every kind of entity update that runs when the market data changes."""
+
+
+def test_market_day(benchmark, market_day, record_allocations):
+    """Turning a market date's quarter-hourly prices into a series (CET)."""
+    results = spot_results(market_day)
+    localize = lambda: QuarterHourSeries.market_day(results.market_date, results.contents.es_spot_price)
+
+    series = benchmark(localize)
+    record_allocations(localize)
+    assert len(series) == cet_quarter_hours(market_day)
+
+
+def test_local_day(benchmark, market_day, local_tz, record_allocations):
+    """Slicing a local day out of the yesterday/today/tomorrow series."""
+    view = OMIEMarketView(None, FixedCoordinator(market_window(market_day)))
+    cet_window = view.series("pt_spot_price")
+    local_day = lambda: cet_window.local_day(market_day, local_tz)
+
+    series = benchmark(local_day)
+    record_allocations(local_day)
+    assert series.start == local_midnight(market_day, local_tz)
+    assert series.end == local_midnight(market_day + timedelta(days=1), local_tz)
+
+
+def test_day_average(benchmark, market_day, local_tz, record_allocations):
+    """Building a local day's quarter-hour dict, average, min/max and provisional flag."""
+    view = OMIEMarketView(None, FixedCoordinator(market_window(market_day)))
+    series = view.series("pt_spot_price").local_day(market_day, local_tz)
+    summarize = lambda: LocalizedDay.of(series, local_tz)
+
+    day = benchmark(summarize)
+    record_allocations(summarize)
+    assert day.average is not None
+
+
+def test_apply_tariff(benchmark, market_day, record_allocations):
+    """Applying a tariff to the yesterday/today/tomorrow series (CET)."""
+    cet_window = OMIEMarketView(None, FixedCoordinator(market_window(market_day))).series("pt_spot_price")
+    apply = lambda: _TARIFF.apply(cet_window)
+
+    tariffed = benchmark(apply)
+    record_allocations(apply)
+    assert len(tariffed) == len(cet_window)
+
+
+@pytest.mark.parametrize("update", list(_UPDATES))
+def test_update_after_data_change(benchmark, market_day, local_tz, record_allocations, update):
+    """An entity's update when the market data has changed, so nothing is cached."""
+    window, update = market_window(market_day), _UPDATES[update]
+    new_view = (lambda: forecast_view(window)) if update.forecast else (lambda: OMIEMarketView(None, FixedCoordinator(window)))
+    compute = lambda: update.compute(new_view(), local_tz, market_day)
+
+    computed = benchmark(compute)
+    record_allocations(compute)
+    assert update.check(computed, local_tz, market_day)
+
+
+def test_update_second_entity(benchmark, market_day, local_tz, record_allocations):
+    """A price sensor's update when another sensor has already localized the same data."""
+    view = OMIEMarketView(None, FixedCoordinator(market_window(market_day)))
+    view.localized("pt_spot_price", local_tz, market_day)
+    update = lambda: _price_attributes(view.localized("pt_spot_price", local_tz, market_day), PRICE_ATTRIBUTES_FULL)
+
+    benchmark(update)
+    record_allocations(update)
+
+
+def test_quarter_hour_tick(benchmark, market_day, local_tz, record_allocations):
+    """Moving a price sensor's state on to the next quarter-hour."""
+    view = OMIEMarketView(None, FixedCoordinator(market_window(market_day)))
+    series = view.localized("pt_spot_price", local_tz, market_day).today.series
+    now = series.start + timedelta(hours=12, minutes=7)
+    tick = lambda: series.at(now)
+
+    benchmark(tick)
+    record_allocations(tick)
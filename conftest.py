@@ -0,0 +1,22 @@
+"""Fixtures shared by the tests and the benchmarks."""
+from __future__ import annotations
+
+from datetime import date
+from zoneinfo import ZoneInfo
+
+import pytest
+import pytz
+
+from tests.market_data import MARKET_DAYS, TIME_ZONES
+
+
+@pytest.fixture(params=list(MARKET_DAYS))
+def market_day(request) -> date:
+    return MARKET_DAYS[request.param]
+
+
+@pytest.fixture(params=[(name, zone) for name in TIME_ZONES for zone in ("zoneinfo", "pytz")], ids="-".join)
+def local_tz(request):
+    """Home Assistant hands out zoneinfo time zones, and the integration's own constants are pytz ones."""
+    name, zone = request.param
+    return ZoneInfo(name) if zone == "zoneinfo" else pytz.timezone(name)
@@ -2,62 +2,125 @@ from __future__ import annotations
 
 __version__ = "1.0.11-beta.1"
 
+import asyncio
 import logging
-from datetime import timedelta
+from datetime import date
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.util import utcnow
 
-from .const import DOMAIN, CET
-from .coordinator import spot_price, OMIEDailyCoordinator, DateFactory
-from .model import OMIECoordinators, OMIESources
+from .archive import OMIEArchive, async_remove_archive
+from .const import DOMAIN, CET, CONF_ARCHIVE_START, CONF_FORECAST, DEFAULT_FORECAST
+from .coordinator import OMIEMarketCoordinator, OMIEFetchScheduler, async_remove_stored_results, results_store
+from .fetch import OMIEFetchCache
+from .forecast import OMIEForecaster
+from .model import OMIECoordinators, OMIEData
+from .services import async_setup_services, async_unload_services
+from .sources import SOURCES, SPOT
+from .transitions import OMIETransitionTracker, conditions_from_options
+from .view import OMIEMarketView
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = [Platform.SENSOR]
+PLATFORMS = [Platform.SENSOR, Platform.BINARY_SENSOR]
+
+_PRICE_SERIES = ("pt_spot_price", "es_spot_price")
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up from a config entry."""
 
     # OMIE data is in the CET timezone so today's date locally may be tomorrow
-    # or yesterday in that timezone. we fetch (today-1,today,today+1) as that is
-    # needed to correctly handle the hours when PT and ES are on different dates.
+    # or yesterday in that timezone. the coordinator holds (today-1,today,today+1)
+    # as that is needed to correctly handle the hours when PT and ES are on different dates.
     cet_today = lambda: utcnow().astimezone(CET).date()
-    cet_tomorrow = lambda: cet_today() + timedelta(days=1)
-    cet_yesterday = lambda: cet_today() - timedelta(days=1)
-
-    # These are asking to be rewritten into coordinators that do 3 fetches for each
-    # OMIE source file: previous, current and next day.
-
-    spot = OMIEDailyCoordinator(hass,
-                                "spot",
-                                market_updater=spot_price,
-                                market_date=cet_today)
-
-    spot_next = OMIEDailyCoordinator(hass,
-                                     "spot_next",
-                                     market_updater=spot_price,
-                                     market_date=cet_tomorrow,
-                                     none_before="13:30")
-
-    spot_previous = OMIEDailyCoordinator(hass,
-                                         "spot_previous",
-                                         market_updater=spot_price,
-                                         market_date=cet_yesterday)
-
-    hass.data[DOMAIN] = OMIECoordinators(
-        spot=OMIESources(today=spot, tomorrow=spot_next, yesterday=spot_previous),
+
+    # config entries only differ in how they present the prices, so they share their fetches, timer and stored results
+    data: OMIEData | None = hass.data.get(DOMAIN)
+    if data is None:
+        data = hass.data[DOMAIN] = OMIEData(fetch_cache=OMIEFetchCache(), scheduler=OMIEFetchScheduler(hass, DOMAIN),
+                                            stores={key: results_store(hass, key) for key in SOURCES}, entries={})
+
+    # every source is fetched by the same timer, but only while entities are subscribed to it. their views share one cache.
+    cache = {}
+    coordinators = {}
+    views = {}
+    for source in SOURCES.values():
+        coordinator = OMIEMarketCoordinator(hass, source.key, market_fetcher=source.market_fetcher,
+                                            contents_type=source.contents_type, market_date=cet_today,
+                                            sessions=source.sessions, scheduler=data.scheduler, fetch_cache=data.fetch_cache,
+                                            store=data.stores[source.key])
+        coordinators[source.key] = coordinator
+
+    # the results persisted by the previous run are served until they are revalidated in the background
+    await asyncio.gather(*[c.async_restore() for c in coordinators.values()])
+
+    archive = None
+    if (archive_start := entry.options.get(CONF_ARCHIVE_START)) and any(e.archive is not None for e in data.entries.values()):
+        _LOGGER.warning("%s: not archiving the spot prices, which another entry already archives", entry.title)
+    elif archive_start:
+        # complete days are archived as the window moves past them, and older ones are backfilled in the background
+        archive = OMIEArchive(hass, coordinators[SPOT.key], market_fetcher=SOURCES[SPOT.key].market_fetcher,
+                              start=date.fromisoformat(archive_start))
+        entry.async_on_unload(archive.async_setup())
+
+    forecaster = None
+    if entry.options.get(CONF_FORECAST, DEFAULT_FORECAST):
+        # the prices that are not published yet are estimated from the recent history
+        forecaster = OMIEForecaster(hass, coordinators[SPOT.key], archive, series=_PRICE_SERIES)
+        entry.async_on_unload(forecaster.async_setup())
+
+    for key, coordinator in coordinators.items():
+        views[key] = OMIEMarketView(hass, coordinator, cache, forecaster=forecaster if key == SPOT.key else None)
+        entry.async_on_unload(views[key].async_setup())
+
+    transitions = None
+    if conditions := conditions_from_options(entry.options):
+        # the binary sensors and events only change when a price crosses a threshold or enters or leaves the cheapest share
+        transitions = OMIETransitionTracker(hass, views[SPOT.key], _PRICE_SERIES, conditions, entry.entry_id)
+        entry.async_on_unload(transitions.async_setup())
+
+    if len(data.entries) == 0:
+        async_setup_services(hass)
+    data.entries[entry.entry_id] = OMIECoordinators(
+        coordinators=coordinators,
+        views=views,
+        entity_stats={},
+        archive=archive,
+        forecaster=forecaster,
+        transitions=transitions,
     )
 
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    hass.data.pop(DOMAIN)
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+    if unload_ok:
+        data: OMIEData = hass.data[DOMAIN]
+        data.entries.pop(entry.entry_id)
+        if len(data.entries) == 0:
+            hass.data.pop(DOMAIN)
+            async_unload_services(hass)
     return unload_ok
+
+
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload a config entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the results persisted for a config entry, unless other entries still use them."""
+    if any(e.entry_id != entry.entry_id for e in hass.config_entries.async_entries(DOMAIN)):
+        return
+
+    for source in SOURCES.values():
+        await async_remove_stored_results(hass, source.key)
+    await async_remove_archive(hass)
@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import os
+import shutil
+import sys
+from array import array
+from collections import deque
+from datetime import date, timedelta
+from typing import Any, Iterable, TYPE_CHECKING
+
+from aiohttp import ClientError
+from homeassistant.const import CURRENCY_EURO, UnitOfEnergy
+from homeassistant.core import HomeAssistant, callback, CALLBACK_TYPE
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.storage import STORAGE_DIR
+from homeassistant.util import utcnow
+from pyomie import QUARTER_HOURLY_START_DATE
+from pyomie.model import OMIEResults, SpotData
+
+from .const import DOMAIN, CET
+from .coordinator import OMIEMarketCoordinator, MarketFetcher
+from .series import QuarterHourSeries, local_midnight, QUARTER_HOUR
+from .stats import Stats
+
+if TYPE_CHECKING:
+    # the recorder is only imported when statistics are imported, by which time it is loaded
+    from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+
+_LOGGER = logging.getLogger(__name__)
+
+ARCHIVE_SERIES = ("pt_spot_price", "es_spot_price")
+"""The series that are archived, in the order in which they are laid out in each day's record."""
+
+_SLOTS = 25 * 4
+"""Quarter-hours reserved for each day and series: enough for the day that DST ends. Unused ones hold NaN."""
+
+_DAY_RECORD = len(ARCHIVE_SERIES) * _SLOTS
+"""Number of float32 values in one day's record."""
+
+_BACKFILL_CONCURRENCY = 2
+"""Number of market files fetched at the same time while backfilling."""
+
+_BACKFILL_INTERVAL = timedelta(seconds=1)
+"""Pause after each fetch while backfilling, so that OMIE sees at most this many requests per second per worker."""
+
+_BACKFILL_BATCH = 30
+"""Number of fetched days to accumulate before they are written out, so that an interrupted backfill loses little."""
+
+
+class OMIEArchive:
+    """Long-term archive of the spot prices, kept in compact columnar files and imported into long-term statistics.
+
+    There is one file per year, holding a fixed-size float32 record for every day of the year so that the date is the
+    index: a day's record starts at `day_of_year * _DAY_RECORD`. Days that are not archived are all NaN. Days are
+    archived from the coordinator's results as they become complete and backfilled from OMIE back to `start`. The files
+    are written by one store at a time, and a day is only stored (and its statistics imported) once.
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator: OMIEMarketCoordinator, market_fetcher: MarketFetcher,
+                 start: date) -> None:
+        self.hass = hass
+        self.coordinator = coordinator
+        self.start = max(start, QUARTER_HOURLY_START_DATE)
+        self.stats = Stats()
+        self._market_fetcher = market_fetcher
+        self._path = archive_path(hass)
+        self._archived: set[date] = set()
+        self._storing: set[date] = set()
+        self._write_lock = asyncio.Lock()
+        self._backfilling = False
+        self._tasks: set[asyncio.Task] = set()
+
+    async def async_load(self) -> None:
+        """Builds the date index from the files on disk."""
+        self._archived = await self.hass.async_add_executor_job(self._scan)
+        _LOGGER.debug("%s: archive holds %d days", self.coordinator.name, len(self._archived))
+
+    @callback
+    def async_setup(self) -> CALLBACK_TYPE:
+        """Starts archiving the coordinator's results and backfilling once the archive is loaded, in the background.
+
+        Returns a callback that undoes it.
+        """
+        unsubs: list[CALLBACK_TYPE] = []
+
+        async def start() -> None:
+            await self.async_load()
+            unsubs.append(self.coordinator.async_add_listener(self._archive_held))
+            self._archive_held()
+
+        self._track(self.hass.async_create_background_task(start(), f"{self.coordinator.name} archive load"))
+
+        @callback
+        def unsubscribe() -> None:
+            for unsub in unsubs:
+                unsub()
+            for task in self._tasks:
+                task.cancel()
+
+        return unsubscribe
+
+    def missing(self, until: date) -> list[date]:
+        """Returns the dates from `start` up to (but excluding) `until` that are not archived yet, oldest first."""
+        return [d for d in _dates(self.start, until) if d not in self._archived]
+
+    def diagnostics(self) -> dict[str, Any]:
+        cet_today = self.coordinator.data.market_date if self.coordinator.data is not None else None
+        return {
+            "start": self.start.isoformat(),
+            "days": len(self._archived),
+            "first": min(self._archived).isoformat() if self._archived else None,
+            "last": max(self._archived).isoformat() if self._archived else None,
+            "missing": len(self.missing(cet_today)) if cet_today is not None else None,
+            "stats": self.stats.as_dict(),
+        }
+
+    async def async_series(self, series: str, start: date, end: date) -> QuarterHourSeries:
+        """Returns the archived prices for the market dates in `[start, end)`, with NaN where a day is not archived."""
+        records = await self.hass.async_add_executor_job(self._read, start, end)
+        index = ARCHIVE_SERIES.index(series)
+        return QuarterHourSeries.span(local_midnight(start, CET), local_midnight(end, CET), [
+            _market_day(d, record, index) for d, record in records.items()
+        ])
+
+    async def async_backfill(self) -> None:
+        """Fetches every day that is missing from the archive, a few at a time. Can be interrupted and resumed."""
+        if self._backfilling:
+            return
+
+        missing = deque(self.missing(self.coordinator.data.market_date if self.coordinator.data is not None else _cet_today()))
+        if len(missing) == 0:
+            return
+
+        _LOGGER.debug("%s: backfilling %d days from %s", self.coordinator.name, len(missing), missing[0])
+        client_session = async_get_clientsession(self.hass)
+        fetched: dict[date, OMIEResults[SpotData]] = {}
+
+        async def flush() -> None:
+            batch = dict(fetched)
+            fetched.clear()
+            await self._async_store(batch.values())
+
+        async def worker() -> None:
+            while missing:
+                market_date = missing.popleft()
+                try:
+                    with self.stats.timed("backfill_ms"):
+                        result = await self._market_fetcher(client_session, market_date, None)
+                except (ClientError, asyncio.TimeoutError) as e:
+                    # will be retried by the next backfill
+                    _LOGGER.debug("%s: could not backfill %s: %s", self.coordinator.name, market_date, e)
+                    self.stats.count("backfill_errors")
+                except Exception:
+                    # a file that cannot be fetched or parsed must not stop the backfill of the other days
+                    _LOGGER.exception("%s: skipping %s, which could not be backfilled", self.coordinator.name, market_date)
+                    self.stats.count("backfill_errors")
+                else:
+                    self.stats.count("bytes_downloaded", result.downloaded)
+                    fetched[market_date] = result.results
+                    if len(fetched) >= _BACKFILL_BATCH:
+                        await flush()
+
+                await asyncio.sleep(_BACKFILL_INTERVAL.total_seconds())
+
+        self._backfilling = True
+        try:
+            await asyncio.gather(*[worker() for _ in range(_BACKFILL_CONCURRENCY)])
+        finally:
+            self._backfilling = False
+            if fetched:
+                await flush()
+
+    @callback
+    def _archive_held(self) -> None:
+        """Archives the days held by the coordinator that are complete, i.e. before today (CET), then backfills the rest.
+
+        Days that could not be backfilled are retried the next time that the coordinator's data changes.
+        """
+        window = self.coordinator.data
+        if window is None:
+            return
+
+        complete = [r for d, r in window.results.items() if d < window.market_date and d >= self.start and d not in self._archived]
+        if complete or (not self._backfilling and self.missing(window.market_date)):
+            self._track(self.hass.async_create_background_task(self._async_archive(complete), f"{self.coordinator.name} archive"))
+
+    def _track(self, task: asyncio.Task) -> None:
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _async_archive(self, complete: list[OMIEResults[SpotData]]) -> None:
+        await self._async_store(complete)
+        await self.async_backfill()
+
+    async def _async_store(self, results: Iterable[OMIEResults[SpotData]]) -> None:
+        # days that another store is already writing are left to it
+        records = {r.market_date: _record(r) for r in results
+                   if r is not None and r.market_date not in self._archived and r.market_date not in self._storing}
+        if len(records) == 0:
+            return
+
+        self._storing.update(records)
+        try:
+            async with self._write_lock:
+                with self.stats.timed("write_ms"):
+                    await self.hass.async_add_executor_job(self._write, records)
+        finally:
+            self._storing.difference_update(records)
+        self._archived.update(records)
+        self.stats.count("days_archived", len(records))
+        _LOGGER.debug("%s: archived %s", self.coordinator.name, sorted(records))
+        self._import_statistics(records)
+
+    @callback
+    def _import_statistics(self, records: dict[date, array]) -> None:
+        """Imports the hourly mean, min and max of the archived prices into the recorder's long-term statistics."""
+        if "recorder" not in self.hass.config.components:
+            return
+
+        from homeassistant.components.recorder.statistics import async_add_external_statistics
+
+        for index, series in enumerate(ARCHIVE_SERIES):
+            statistics = [s for d, record in sorted(records.items()) for s in _hourly(_market_day(d, record, index))]
+            async_add_external_statistics(self.hass, statistic_metadata(series), statistics)
+
+    def _scan(self) -> set[date]:
+        archived = set()
+        if not os.path.isdir(self._path):
+            return archived
+
+        for name in os.listdir(self._path):
+            year = _year_of(name)
+            if year is None:
+                continue
+
+            values = _read_year(self._file(year))
+            for day in range(len(values) // _DAY_RECORD):
+                if not math.isnan(values[day * _DAY_RECORD]):
+                    archived.add(date(year, 1, 1) + timedelta(days=day))
+
+        return archived
+
+    def _read(self, start: date, end: date) -> dict[date, array]:
+        records = {}
+        years: dict[int, array] = {}
+        for d in _dates(start, end):
+            if d.year not in years:
+                years[d.year] = _read_year(self._file(d.year))
+
+            offset = (d.timetuple().tm_yday - 1) * _DAY_RECORD
+            record = years[d.year][offset:offset + _DAY_RECORD]
+            if len(record) == _DAY_RECORD and not math.isnan(record[0]):
+                records[d] = record
+
+        return records
+
+    def _write(self, records: dict[date, array]) -> None:
+        os.makedirs(self._path, exist_ok=True)
+        for year in sorted({d.year for d in records}):
+            path = self._file(year)
+            try:
+                # never truncates a file that already holds archived days
+                with open(path, "xb") as f:
+                    _to_file(array("f", [math.nan]) * (_DAY_RECORD * 366), f)
+            except FileExistsError:
+                pass
+
+            with open(path, "r+b") as f:
+                for d, record in sorted(records.items()):
+                    if d.year == year:
+                        f.seek((d.timetuple().tm_yday - 1) * _DAY_RECORD * record.itemsize)
+                        _to_file(record, f)
+
+    def _file(self, year: int) -> str:
+        return os.path.join(self._path, f"{year}.f32")
+
+
+def archive_path(hass: HomeAssistant) -> str:
+    """Returns the directory that holds the archive files."""
+    return hass.config.path(STORAGE_DIR, f"{DOMAIN}.archive")
+
+
+async def async_remove_archive(hass: HomeAssistant) -> None:
+    """Removes the archive files."""
+    await hass.async_add_executor_job(shutil.rmtree, archive_path(hass), True)
+
+
+def statistic_id(series: str) -> str:
+    """Returns the id of the external statistic into which the given series is imported."""
+    return f"{DOMAIN}:{series}"
+
+
+def statistic_metadata(series: str) -> StatisticMetaData:
+    try:
+        from homeassistant.components.recorder.models import StatisticMeanType
+        mean: dict[str, Any] = {"mean_type": StatisticMeanType.ARITHMETIC}
+    except ImportError:
+        # cores before 2025.4 only know has_mean, which later ones deprecate
+        mean = {"has_mean": True}
+
+    return {
+        **mean,
+        "has_sum": False,
+        "name": f"OMIE {series.replace('_', ' ')}",
+        "source": DOMAIN,
+        "statistic_id": statistic_id(series),
+        "unit_of_measurement": f"{CURRENCY_EURO}/{UnitOfEnergy.MEGA_WATT_HOUR}",
+    }
+
+
+def _record(results: OMIEResults[SpotData]) -> array:
+    record = array("f", [math.nan]) * _DAY_RECORD
+    for index, series in enumerate(ARCHIVE_SERIES):
+        values = getattr(results.contents, series)[:_SLOTS]
+        record[index * _SLOTS:index * _SLOTS + len(values)] = array("f", values)
+    return record
+
+
+def _market_day(market_date: date, record: array, index: int) -> QuarterHourSeries:
+    quarter_hours = (local_midnight(market_date + timedelta(days=1), CET) - local_midnight(market_date, CET)) // QUARTER_HOUR
+    # prices have 2 decimal places, which rounding recovers exactly from float32
+    values = record[index * _SLOTS:index * _SLOTS + quarter_hours]
+    return QuarterHourSeries.market_day(market_date, array("d", (round(v, 2) for v in values)))
+
+
+def _hourly(series: QuarterHourSeries) -> list[StatisticData]:
+    """Aggregates the quarter-hours into hours, which always start on the hour because CET is a whole-hour offset."""
+    statistics = []
+    for i in range(0, len(series), 4):
+        known = [v for v in series.values[i:i + 4] if v == v]
+        if known:
+            statistics.append({"start": series.start + i * QUARTER_HOUR, "mean": round(math.fsum(known) / len(known), 2),
+                               "min": min(known), "max": max(known)})
+    return statistics
+
+
+def _read_year(path: str) -> array:
+    values = array("f")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            values.frombytes(f.read())
+        if sys.byteorder != "little":
+            values.byteswap()
+    return values
+
+
+def _to_file(values: array, f) -> None:
+    # the files are little-endian wherever they were written
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    values.tofile(f)
+
+
+def _year_of(name: str) -> int | None:
+    stem, _, ext = name.partition(".")
+    return int(stem) if ext == "f32" and stem.isdigit() else None
+
+
+def _dates(start: date, end: date) -> list[date]:
+    return [start + timedelta(days=i) for i in range((end - start).days)]
+
+
+def _cet_today() -> date:
+    return utcnow().astimezone(CET).date()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import logging
+
+from homeassistant.components.binary_sensor import BinarySensorEntity
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.util import slugify
+
+from .const import DOMAIN
+from .entity import entry_device_info, entry_object_prefix
+from .model import OMIEData
+from .transitions import PriceCondition
+from .translations import ENTITY_NAMES
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> bool:
+    """Set up the OMIE binary sensors from their config entry."""
+    data: OMIEData = hass.data[DOMAIN]
+    tracker = data.entries[entry.entry_id].transitions
+    if tracker is None:
+        return True
+
+    object_prefix = entry_object_prefix(entry)
+    device_info = entry_device_info(hass, entry)
+    entity_names = ENTITY_NAMES.get_all(hass.config.language)
+
+    class PriceConditionEntity(BinarySensorEntity):
+        def __init__(self, key: str, name: str, series: str, condition: PriceCondition):
+            """Initialize the binary sensor."""
+            self._attr_device_info = device_info
+            self._attr_unique_id = slugify(f'{object_prefix}_{key}')
+            self._attr_name = name
+            self._attr_icon = "mdi:cash-clock"
+            self._attr_should_poll = False
+            self._series = series
+            self._condition = condition
+            self.entity_id = f"binary_sensor.{self._attr_unique_id}"
+
+        async def async_added_to_hass(self) -> None:
+            """Register callbacks."""
+
+            @callback
+            def update() -> None:
+                """Update this sensor's state, which the tracker only calls for at the instants when it may change."""
+                self._attr_is_on = tracker.state(self._series, self._condition)
+                self._attr_extra_state_attributes = {
+                    'next_change': tracker.next_change(self._series, self._condition),
+                    'threshold': self._condition.threshold,
+                    'share': self._condition.cheapest_share,
+                }
+                # the state machine ignores writes that change nothing
+                self.async_write_ha_state()
+
+            self.async_on_remove(tracker.async_add_listener(update))
+            update()
+
+    sensors = []
+    for country, series in [("pt", "pt_spot_price"), ("es", "es_spot_price")]:
+        for condition in tracker.conditions:
+            if condition.threshold is not None:
+                name = getattr(entity_names, f'spot_price_{country}_below').format(threshold=f"{condition.threshold:g}")
+            else:
+                name = getattr(entity_names, f'spot_price_{country}_cheapest').format(share=condition.cheapest_share)
+            sensors.append(PriceConditionEntity(key=f"spot_price_{country}_{condition.key}", name=name, series=series,
+                                                condition=condition))
+
+    async_add_entities(sensors)
+    return True
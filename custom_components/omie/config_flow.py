@@ -3,10 +3,21 @@ from __future__ import annotations
 import logging
 from typing import Any
 
+import voluptuous as vol
 from homeassistant import config_entries
+from homeassistant.const import CONF_NAME
+from homeassistant.core import callback
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers.selector import DateSelector
 
-from .const import DEFAULT_NAME, DOMAIN
+from .const import DEFAULT_NAME, DOMAIN, CONF_PRICE_ATTRIBUTES, DEFAULT_PRICE_ATTRIBUTES, PRICE_ATTRIBUTES_FULL, \
+    PRICE_ATTRIBUTES_SUMMARY, CONF_CHEAPEST_WINDOW, DEFAULT_CHEAPEST_WINDOW, CONF_DIAGNOSTIC_SENSORS, \
+    DEFAULT_DIAGNOSTIC_SENSORS, CONF_ARCHIVE_START, CONF_TARIFF, TARIFF_NONE, CONF_TARIFF_MULTIPLIER, CONF_TARIFF_ADDER, \
+    CONF_TARIFF_ACCESS, CONF_TARIFF_VAT, CONF_RESOLUTION, DEFAULT_RESOLUTION, RESOLUTION_QUARTER_HOURLY, RESOLUTION_HOURLY, \
+    RESOLUTION_BOTH, CONF_FORECAST, DEFAULT_FORECAST, CONF_PRICE_THRESHOLDS, CONF_CHEAPEST_SHARE, DEFAULT_CHEAPEST_SHARE
+from .entity import entry_object_prefix, name_object_prefix, OBJECT_PREFIX
+from .tariff import PERIOD_TABLES, tariff_from_options
+from .transitions import conditions_from_options
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -16,10 +27,78 @@ class OMIEConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
 
     async def async_step_user(self, user_input: dict[str, Any] | None = None) -> FlowResult:
-        if self._async_current_entries():
-            return self.async_abort(reason="single_instance_allowed")
+        if not self._async_current_entries():
+            if user_input is not None:
+                return self.async_create_entry(title=DEFAULT_NAME, data={})
 
+            return self.async_show_form(step_id="user")
+
+        # further entries present the same prices with other options, so they only need a name to tell them apart. the
+        # name is compared by the ids that it gives the entities, which must not clash with another entry's.
+        errors = {}
+        if user_input is not None:
+            prefix = name_object_prefix(user_input[CONF_NAME])
+            if prefix == OBJECT_PREFIX:
+                errors[CONF_NAME] = "name_invalid"
+            elif any(entry_object_prefix(e) == prefix for e in self._async_current_entries(include_ignore=False)):
+                return self.async_abort(reason="already_configured")
+            else:
+                return self.async_create_entry(title=user_input[CONF_NAME], data={CONF_NAME: user_input[CONF_NAME]})
+
+        return self.async_show_form(step_id="name", data_schema=vol.Schema({vol.Required(CONF_NAME): str}), errors=errors)
+
+    async def async_step_name(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        return await self.async_step_user(user_input)
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry) -> OMIEOptionsFlow:
+        return OMIEOptionsFlow()
+
+
+class OMIEOptionsFlow(config_entries.OptionsFlow):
+    """OMIE options flow."""
+
+    async def async_step_init(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        errors = {}
         if user_input is not None:
-            return self.async_create_entry(title=DEFAULT_NAME, data={})
+            try:
+                tariff_from_options(user_input)
+            except ValueError:
+                errors[CONF_TARIFF_ACCESS] = "tariff_access"
+            try:
+                conditions_from_options(user_input)
+            except ValueError:
+                errors[CONF_PRICE_THRESHOLDS] = "price_thresholds"
+            if not errors:
+                return self.async_create_entry(title="", data=user_input)
 
-        return self.async_show_form(step_id="user")
+        options = user_input or self.config_entry.options
+        return self.async_show_form(step_id="init", data_schema=vol.Schema({
+            vol.Required(CONF_PRICE_ATTRIBUTES, default=options.get(CONF_PRICE_ATTRIBUTES, DEFAULT_PRICE_ATTRIBUTES)):
+                vol.In([PRICE_ATTRIBUTES_FULL, PRICE_ATTRIBUTES_SUMMARY]),
+            vol.Required(CONF_RESOLUTION, default=options.get(CONF_RESOLUTION, DEFAULT_RESOLUTION)):
+                vol.In([RESOLUTION_QUARTER_HOURLY, RESOLUTION_HOURLY, RESOLUTION_BOTH]),
+            vol.Required(CONF_CHEAPEST_WINDOW, default=options.get(CONF_CHEAPEST_WINDOW, DEFAULT_CHEAPEST_WINDOW)):
+                vol.All(vol.Coerce(int), vol.Range(min=0, max=24)),
+            vol.Optional(CONF_PRICE_THRESHOLDS, description={"suggested_value": options.get(CONF_PRICE_THRESHOLDS)}):
+                str,
+            vol.Required(CONF_CHEAPEST_SHARE, default=options.get(CONF_CHEAPEST_SHARE, DEFAULT_CHEAPEST_SHARE)):
+                vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+            vol.Required(CONF_DIAGNOSTIC_SENSORS, default=options.get(CONF_DIAGNOSTIC_SENSORS, DEFAULT_DIAGNOSTIC_SENSORS)):
+                bool,
+            vol.Optional(CONF_ARCHIVE_START, description={"suggested_value": options.get(CONF_ARCHIVE_START)}):
+                DateSelector(),
+            vol.Required(CONF_FORECAST, default=options.get(CONF_FORECAST, DEFAULT_FORECAST)):
+                bool,
+            vol.Required(CONF_TARIFF, default=options.get(CONF_TARIFF, TARIFF_NONE)):
+                vol.In([TARIFF_NONE, *PERIOD_TABLES]),
+            vol.Required(CONF_TARIFF_MULTIPLIER, default=options.get(CONF_TARIFF_MULTIPLIER, 1.0)):
+                vol.Coerce(float),
+            vol.Required(CONF_TARIFF_ADDER, default=options.get(CONF_TARIFF_ADDER, 0.0)):
+                vol.Coerce(float),
+            vol.Optional(CONF_TARIFF_ACCESS, description={"suggested_value": options.get(CONF_TARIFF_ACCESS)}):
+                str,
+            vol.Required(CONF_TARIFF_VAT, default=options.get(CONF_TARIFF_VAT, 0.0)):
+                vol.All(vol.Coerce(float), vol.Range(min=0, max=100)),
+        }), errors=errors)
@@ -7,3 +7,84 @@ DOMAIN: Final = "omie"
 DEFAULT_NAME: Final = "OMIE"
 
 CET = pytz.timezone("CET")
+TZ_LISBON = pytz.timezone("Europe/Lisbon")
+TZ_MADRID = pytz.timezone("Europe/Madrid")
+
+CONF_PRICE_ATTRIBUTES: Final = "price_attributes"
+"""Which attributes the price sensors publish."""
+
+PRICE_ATTRIBUTES_FULL: Final = "full"
+"""Summary attributes plus every quarter-hour's price for today and tomorrow."""
+
+PRICE_ATTRIBUTES_SUMMARY: Final = "summary"
+"""Averages, min/max and provisional flags only. The full curves are available through the `get_prices` service."""
+
+DEFAULT_PRICE_ATTRIBUTES: Final = PRICE_ATTRIBUTES_FULL
+
+
+CONF_RESOLUTION: Final = "resolution"
+"""Resolution of the prices in the full price attributes."""
+
+RESOLUTION_QUARTER_HOURLY: Final = "15m"
+"""Every quarter-hour's price, in `today_hours` and `tomorrow_hours`."""
+
+RESOLUTION_HOURLY: Final = "hourly"
+"""Hourly averages only, in `today_hourly` and `tomorrow_hourly`."""
+
+RESOLUTION_BOTH: Final = "both"
+"""Quarter-hourly prices and hourly averages."""
+
+DEFAULT_RESOLUTION: Final = RESOLUTION_QUARTER_HOURLY
+
+
+CONF_CHEAPEST_WINDOW: Final = "cheapest_window"
+"""Duration in hours of the window tracked by the cheapest window sensors, or 0 for no such sensors."""
+
+DEFAULT_CHEAPEST_WINDOW: Final = 0
+
+
+CONF_PRICE_THRESHOLDS: Final = "price_thresholds"
+"""Comma-separated spot prices in €/MWh. Binary sensors are on while the price is below each of them."""
+
+CONF_CHEAPEST_SHARE: Final = "cheapest_share"
+"""Percentage of each day's quarter-hours, the cheapest, in which binary sensors are on. 0 for no such sensors."""
+
+DEFAULT_CHEAPEST_SHARE: Final = 0
+
+EVENT_PRICE_TRANSITION: Final = "omie_price_transition"
+"""Fired at the start of every quarter-hour in which a spot price crosses a threshold or enters or leaves the cheapest
+share of the day."""
+
+
+CONF_DIAGNOSTIC_SENSORS: Final = "diagnostic_sensors"
+"""Whether to add sensors that show how long fetching and updating the prices takes."""
+
+DEFAULT_DIAGNOSTIC_SENSORS: Final = False
+
+
+CONF_ARCHIVE_START: Final = "archive_start"
+"""Market date (ISO format) from which to keep a long-term archive of the spot prices, or absent for no archive."""
+
+
+CONF_FORECAST: Final = "forecast"
+"""Whether to estimate the prices that are not published yet."""
+
+DEFAULT_FORECAST: Final = False
+
+
+CONF_TARIFF: Final = "tariff"
+"""Time-of-use period table of the tariff whose retail prices a sensor shows, or `none` for no such sensor."""
+
+TARIFF_NONE: Final = "none"
+
+CONF_TARIFF_MULTIPLIER: Final = "tariff_multiplier"
+"""Factor applied to the spot price, e.g. to account for losses."""
+
+CONF_TARIFF_ADDER: Final = "tariff_adder"
+"""Fees added to the spot price in €/MWh."""
+
+CONF_TARIFF_ACCESS: Final = "tariff_access"
+"""Comma-separated access charges in €/MWh, one for each period of the table."""
+
+CONF_TARIFF_VAT: Final = "tariff_vat"
+"""VAT rate in percent."""
@@ -1,94 +1,300 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import random
-from datetime import timedelta, date
-from typing import Callable, Awaitable, TypeVar
+from datetime import timedelta, date, datetime, time
+from typing import Callable, Awaitable, Sequence, Any
 
 from aiohttp import ClientSession
-from homeassistant.core import HomeAssistant, callback, HassJob, HassJobType
+from homeassistant.core import HomeAssistant, callback, HassJob, HassJobType, CALLBACK_TYPE
 from homeassistant.helpers import event
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 from homeassistant.util import utcnow
-from pyomie.main import spot_price as pyomie_spot
+from pyomie import QUARTER_HOURLY_START_DATE
+from pyomie.main import DateComponents
 from pyomie.model import OMIEResults, SpotData
 
 from .const import DOMAIN, CET
+from .fetch import Fetched, Validators, fetch_market_file, OMIEFetchCache
+from .model import OMIEMarketWindow, OMIEFile
+from .schedule import MarketSession, last_publication, next_publication
+from .stats import Stats
 
 _LOGGER = logging.getLogger(__name__)
-_HOURS = list(range(25))
-"""Max number of hours in a day (on the day that DST ends)."""
 
 _SCHEDULE_MAX_DELAY = timedelta(seconds=3)
 """The maximum delay after the scheduled time that we will fetch from OMIE to avoid thundering herd."""
 
-# language=Markdown
-#
-# OMIE market sessions and the values that they influence. Time shown below is publication time in the CET timezone plus 10 minutes.
-#
-# ```
-# | Time  | Name        | Spot | Adj  | Spot+1 | Ajd+1 |
-# |-------|-------------|------|------|--------|-------|
-# | 02:30 | Intraday 4  |  X   |  X   |        |       |
-# | 05:30 | Intraday 5  |  X   |  X   |        |       |
-# | 10:30 | Intraday 6  |  X   |  X   |        |       |
-# | 13:30 | Day-ahead   |      |      |   X    |   X   |
-# | 16:30 | Intraday 1  |      |      |   X    |   X   |
-# | 18:30 | Intraday 2  |  X   |  X   |   X    |   X   |
-# | 22:30 | Intraday 3  |      |      |   X    |   X   |
-# ```
-#
-# References:
-# - https://www.omie.es/en/mercado-de-electricidad
-# - https://www.omie.es/sites/default/files/inline-files/intraday_and_continuous_markets.pdf
-
-_DataT = TypeVar("_DataT")
-
 DateFactory = Callable[[], date]
 """Used by the coordinator to work out the market date to fetch."""
 
-UpdateMethod = Callable[[], Awaitable[OMIEResults[_DataT] | None]]
-"""Method that updates this coordinator's data."""
+MarketFetcher = Callable[[ClientSession, date, Validators | None], Awaitable[Fetched[SpotData]]]
+"""Fetches the market results for a given date, unless unchanged since the given validators were obtained."""
+
+
+DEFAULT_WINDOW = (-1, 0, 1)
+"""Yesterday, today and tomorrow (CET). Yesterday is needed to handle the hours when PT and ES are on different dates."""
+
+_RETRY_MIN_DELAY = timedelta(minutes=1)
+"""Delay before retrying to fetch results that should have been published but are not available yet."""
+
+_RETRY_MAX_DELAY = timedelta(minutes=15)
+"""Longest delay between retries, which back off exponentially from the publication time."""
+
+_SESSION_MAX_WAIT = timedelta(hours=1)
+"""How long after a session's publication time to keep retrying for revised results that have not appeared."""
+
+STORAGE_VERSION = 1
+"""Version of the format in which market results are persisted between restarts."""
+
+_STORAGE_SAVE_DELAY = 10
+"""Seconds to wait before persisting updated results, coalescing saves that happen in quick succession."""
 
+OMIE_BASE_URL = "https://www.omie.es"
+"""Where the OMIE market files are published."""
 
-class OMIEDailyCoordinator(DataUpdateCoordinator[OMIEResults[_DataT] | None]):
-    """Coordinator that fetches new data once per day at the specified time, optionally refreshing it throughout the day."""
+
+class OMIEMarketCoordinator(DataUpdateCoordinator[OMIEMarketWindow[SpotData]]):
+    """Coordinator that holds a sliding window of market dates for one OMIE source, fetching only the missing or stale ones."""
 
     def __init__(self,
                  hass: HomeAssistant,
                  name: str,
-                 market_updater: Callable[[ClientSession, DateFactory], UpdateMethod[_DataT]],
-                 market_date: Callable[[], date],
-                 none_before: str | None = None,
-                 update_interval: timedelta | None = None) -> None:
-        super().__init__(hass, _LOGGER, name=f'{DOMAIN}.{name}', update_interval=update_interval,
-                         update_method=market_updater(async_get_clientsession(hass), market_date))
+                 market_fetcher: MarketFetcher,
+                 contents_type: Callable[..., SpotData],
+                 market_date: DateFactory,
+                 sessions: Sequence[MarketSession],
+                 window: Sequence[int] = DEFAULT_WINDOW,
+                 scheduler: OMIEFetchScheduler | None = None,
+                 fetch_cache: OMIEFetchCache | None = None,
+                 store: Store[dict[str, Any]] | None = None) -> None:
+        # listeners are only notified when the data actually changes
+        super().__init__(hass, _LOGGER, name=f'{DOMAIN}.{name}', update_interval=None, always_update=False)
+        self._client_session = async_get_clientsession(hass)
+        self._market_fetcher = market_fetcher
+        self._contents_type = contents_type
+        self._store = store if store is not None else results_store(hass, name)
+        self._validators: dict[date, Validators] = {}
+        self._checked_at: dict[date, datetime] = {}
+        self._retry_at: dict[date, datetime] = {}
         self._market_date = market_date
-        self._none_before = list(map(int, none_before.split(":"))) if none_before is not None else [0, 0]
-        delay_μs = random.randint(0, _SCHEDULE_MAX_DELAY.seconds * 10 ** 6)
-        self._schedule_second = delay_μs // 10 ** 6
-        self._schedule_microsecond = delay_μs % 10 ** 6
-        self.__job = HassJob(
-            self._handle_refresh_interval,
-            f'OMIEDailyCoordinator {name}',
-            job_type=HassJobType.Coroutinefunction)
+        self._sessions = sessions
+        self._window = window
+        self._scheduler = scheduler if scheduler is not None else OMIEFetchScheduler(hass, name)
+        self._scheduler.add(self)
+        self._fetch_cache = fetch_cache
+        self.refreshing = False
+        self.stats = Stats()
+
+    async def async_restore(self) -> bool:
+        """Restores the results persisted by a previous run that are still in the window. Returns whether any were."""
+        stored = await self._store.async_load()
+        if stored is None:
+            return False
+
+        wanted = self._window_dates(self._market_date())
+        results = {}
+        for item in stored.get("results", []):
+            try:
+                restored = self._decode(item)
+            except (KeyError, TypeError, ValueError) as e:
+                _LOGGER.warning("%s: ignoring unreadable stored results: %s", self.name, e)
+                continue
+
+            if restored.market_date in wanted:
+                results[restored.market_date] = restored
+                self._validators[restored.market_date] = Validators(**item.get("validators", {}))
+                self._checked_at[restored.market_date] = datetime.fromisoformat(item.get("checked_at", item["updated_at"]))
+
+        _LOGGER.debug("%s: async_restore restored %s", self.name, list(results))
+        if len(results) == 0:
+            return False
 
-    async def _async_update_data(self) -> OMIEResults[_DataT] | None:
-        if self._wait_for_none_before():
-            # no results can possibly be available at this time of day
-            _LOGGER.debug("%s: _async_update_data returning None before %s CET", self.name, self._none_before)
-            return None
+        self.async_set_updated_data(OMIEMarketWindow(market_date=self._market_date(), results=dict(sorted(results.items()))))
+        return True
 
-        if self._data_is_fresh():
-            # current data is still fresh, don't update:
-            _LOGGER.debug("%s: _async_update_data returning cached (market_date=%s, updated_at=%s, update_interval=%s)", self.name,
-                          self.data.market_date, self.data.updated_at, self.update_interval)
-            return self.data
+    @callback
+    def _data_to_store(self) -> dict[str, Any]:
+        return {"results": [self._encode(r) for r in self.data.results.values()] if self.data is not None else []}
+
+    def _encode(self, results: OMIEResults[SpotData]) -> dict[str, Any]:
+        # the raw file is not kept: it can be many times the size of the parsed contents
+        return {
+            "updated_at": results.updated_at.isoformat(),
+            "checked_at": self._checked_at.get(results.market_date, results.updated_at).isoformat(),
+            "market_date": results.market_date.isoformat(),
+            "validators": self._validators.get(results.market_date, Validators())._asdict(),
+            "contents": results.contents._asdict(),
+        }
+
+    def _decode(self, item: dict[str, Any]) -> OMIEResults[SpotData]:
+        return OMIEResults(
+            updated_at=datetime.fromisoformat(item["updated_at"]),
+            market_date=date.fromisoformat(item["market_date"]),
+            contents=self._contents_type(**item["contents"]),
+            raw="",
+        )
+
+    def _window_dates(self, today: date) -> list[date]:
+        return [today + timedelta(days=offset) for offset in self._window]
+
+    async def _async_update_data(self) -> OMIEMarketWindow[SpotData]:
+        today = self._market_date()
+        now = utcnow()
+        held = self.data.results if self.data is not None else {}
+
+        # shift the window, keeping the days that we already hold
+        results = {}
+        to_fetch = {}
+        self.stats.count("refreshes")
+        for market_date in self._window_dates(today):
+            next_fetch = self._next_fetch(market_date, held.get(market_date), now)
+            if next_fetch is not None and next_fetch <= now:
+                to_fetch[market_date] = self._fresh_since(market_date, now)
+            elif market_date in held:
+                self.stats.count("skipped_fresh")
+                results[market_date] = held[market_date]
+
+        if len(to_fetch) == 0:
+            _LOGGER.debug("%s: _async_update_data returning cached (market_dates=%s)", self.name, list(results))
+            return self.data if self.data is not None and self.data.market_date == today and self.data.results == results \
+                else OMIEMarketWindow(market_date=today, results=results)
+
+        _LOGGER.debug("%s: _async_update_data fetching %s", self.name, list(to_fetch))
+        fetched = await asyncio.gather(*[
+            # only send validators for results that we still hold, as there is nothing to fall back on otherwise
+            self._fetch(d, self._validators.get(d) if d in held else None, now, since) for d, since in to_fetch.items()
+        ], return_exceptions=True)
 
-        else:
-            _LOGGER.debug("%s: _async_update_data refreshing data", self.name)
-            return await super()._async_update_data()
+        errors = []
+        for market_date, result in zip(to_fetch, fetched):
+            self._checked_at[market_date] = now
+            if isinstance(result, Exception):
+                self.stats.count("fetch_errors")
+                errors.append(result)
+                _LOGGER.debug("%s: error fetching %s: %s", self.name, market_date, result)
+                self._retry_later(market_date, now)
+                if market_date in held:
+                    # serve what we have until the fetch succeeds
+                    results[market_date] = held[market_date]
+            else:
+                self._validators[market_date] = result.validators
+                self.stats.count("bytes_downloaded", result.downloaded)
+                if result.results is None:
+                    # unchanged: keep the same results object so that nothing downstream is recomputed. the
+                    # session's results may not have been published yet so check again later.
+                    _LOGGER.debug("%s: %s is unchanged", self.name, market_date)
+                    self.stats.count("unchanged")
+                    self._retry_later(market_date, now)
+                    results[market_date] = held[market_date]
+                else:
+                    self.stats.count("changed")
+                    self.stats.add("parse_ms", result.parse_ms)
+                    self._retry_at.pop(market_date, None)
+                    results[market_date] = result.results
+
+        window_dates = self._window_dates(today)
+        for per_date in [self._validators, self._checked_at, self._retry_at]:
+            for market_date in [d for d in per_date if d not in window_dates]:
+                del per_date[market_date]
+
+        if len(errors) == len(to_fetch):
+            raise UpdateFailed(f"Error fetching {list(to_fetch)}: {errors[0]}") from errors[0]
+
+        self._store.async_delay_save(self._data_to_store, _STORAGE_SAVE_DELAY)
+        return OMIEMarketWindow(market_date=today, results=dict(sorted(results.items())))
+
+    async def _async_refresh(self, *args: Any, **kwargs: Any) -> None:
+        # the shared timer is not cancelled while refreshing, so it must leave this coordinator alone until it is done
+        self.refreshing = True
+        try:
+            await super()._async_refresh(*args, **kwargs)
+        finally:
+            self.refreshing = False
+            self._schedule_refresh()
+
+    async def _fetch(self, market_date: date, validators: Validators | None, now: datetime,
+                     since: datetime | None) -> Fetched[SpotData]:
+        with self.stats.timed("fetch_ms"):
+            if self._fetch_cache is None:
+                return await self._market_fetcher(self._client_session, market_date, validators)
+
+            # other config entries' coordinators may have just fetched the same file
+            return await self._fetch_cache.async_fetch(
+                self.name, market_date, validators, now, since, lambda v: self._market_fetcher(self._client_session, market_date, v))
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update all registered listeners, measuring how long they take between them."""
+        with self.stats.timed("listeners_ms"):
+            super().async_update_listeners()
+        self.stats.add("listeners", len(self._listeners))
+
+    def diagnostics(self) -> dict[str, Any]:
+        """Returns what this coordinator holds and when it will next fetch, for the diagnostics platform."""
+        held = self.data.results if self.data is not None else {}
+        return {
+            "name": self.name,
+            "last_update_success": self.last_update_success,
+            "market_date": self.data.market_date.isoformat() if self.data is not None else None,
+            "next_refresh": self.next_refresh(utcnow()).isoformat(),
+            "results": {
+                d.isoformat(): {
+                    "updated_at": held[d].updated_at.isoformat() if d in held else None,
+                    "checked_at": self._checked_at[d].isoformat() if d in self._checked_at else None,
+                    "retry_at": self._retry_at[d].isoformat() if d in self._retry_at else None,
+                    "validators": self._validators.get(d, Validators())._asdict(),
+                } for d in self._window_dates(self._market_date())
+            },
+            "stats": self.stats.as_dict(),
+        }
+
+    def _next_fetch(self, market_date: date, results: OMIEResults[SpotData] | None, now: datetime) -> datetime | None:
+        """Returns when the results for the market date should next be fetched, or None if there is no need to."""
+        published = last_publication(self._sessions, market_date, now)
+        waiting = published is not None and (
+                results is None or (results.updated_at < published and now < published + _SESSION_MAX_WAIT))
+
+        if not waiting:
+            # no results can possibly be available yet, or we hold the latest ones
+            return next_publication(self._sessions, market_date, now)
+
+        checked_at = self._checked_at.get(market_date)
+        if checked_at is None or checked_at < published:
+            return published
+
+        return self._retry_at.get(market_date, published)
+
+    def _fresh_since(self, market_date: date, now: datetime) -> datetime | None:
+        """Returns when a fetch of the market date must have started after to be as good as fetching it now: after the file
+        was last published and after this coordinator last checked it."""
+        instants = [last_publication(self._sessions, market_date, now), self._checked_at.get(market_date)]
+        return max([i for i in instants if i is not None], default=None)
+
+    def _retry_later(self, market_date: date, now: datetime) -> None:
+        """Backs off exponentially from the time that the results were (or should have been) published."""
+        published = last_publication(self._sessions, market_date, now) or now
+        delay = min(max(now - published, _RETRY_MIN_DELAY), _RETRY_MAX_DELAY)
+        # the jitter is the scheduler's, so that the coordinators that share it retry together and share the fetches
+        self._retry_at[market_date] = now + delay * (1 + self._scheduler.jitter / 10)
+
+    @property
+    def active(self) -> bool:
+        """Whether anything is subscribed to this coordinator, which is only refreshed while it is."""
+        return len(self._listeners) > 0 and not self._shutdown_requested
+
+    def next_refresh(self, now: datetime) -> datetime:
+        """Returns when this coordinator next needs to refresh, which may be in the past if it is due."""
+        today = self._market_date()
+        held = self.data.results if self.data is not None else {}
+
+        # the window shifts at midnight CET, otherwise wake up only when there is something to fetch
+        next_fetches = [self._next_fetch(d, held.get(d), now) for d in self._window_dates(today)]
+        midnight = CET.localize(datetime.combine(today + timedelta(days=1), time()))
+        return min([f for f in next_fetches if f is not None] + [midnight])
 
     @callback
     def _schedule_refresh(self) -> None:
@@ -96,47 +302,115 @@ class OMIEDailyCoordinator(DataUpdateCoordinator[OMIEResults[_DataT] | None]):
         if self.config_entry and self.config_entry.pref_disable_polling:
             return
 
-        if self._unsub_refresh:
-            self._unsub_refresh()
-            self._unsub_refresh = None
+        self._scheduler.async_schedule()
+
+    @callback
+    def _unschedule_refresh(self) -> None:
+        """Stop refreshing once the last listener is removed."""
+        super()._unschedule_refresh()
+        self._scheduler.async_schedule()
+
+    async def async_shutdown(self) -> None:
+        await super().async_shutdown()
+        self._scheduler.remove(self)
+
+
+class OMIEFetchScheduler:
+    """Wakes up the market coordinators that share it with a single timer, set for the earliest of their next refreshes.
+
+    Only coordinators that have listeners are refreshed, so the sources that nothing subscribes to are never fetched.
+    The coordinators of every source and config entry share one scheduler, so that they fetch at the same instants.
+    """
+
+    def __init__(self, hass: HomeAssistant, name: str) -> None:
+        self.hass = hass
+        self.next_refresh: datetime | None = None
+        # retries are postponed by up to a tenth of their delay, by the same fraction for every coordinator
+        self.jitter = random.random()
+        self._name = name
+        self._coordinators: list[OMIEMarketCoordinator] = []
+        self._delay = timedelta(microseconds=random.randint(0, _SCHEDULE_MAX_DELAY.seconds * 10 ** 6))
+        self._unsub: CALLBACK_TYPE | None = None
+        self.__job = HassJob(
+            self._handle_refresh,
+            f'OMIEFetchScheduler {name}',
+            job_type=HassJobType.Coroutinefunction)
+
+    def add(self, coordinator: OMIEMarketCoordinator) -> None:
+        self._coordinators.append(coordinator)
+
+    @callback
+    def remove(self, coordinator: OMIEMarketCoordinator) -> None:
+        if coordinator in self._coordinators:
+            self._coordinators.remove(coordinator)
+        self.async_schedule()
+
+    @callback
+    def async_schedule(self) -> None:
+        """(Re)sets the timer for the earliest refresh needed by an active coordinator, or cancels it if there is none."""
+        if self._unsub:
+            self._unsub()
+            self._unsub = None
+
+        now = utcnow()
+        # coordinators that are refreshing schedule again once they are done
+        next_refreshes = {c.name: c.next_refresh(now) for c in self._coordinators if c.active and not c.refreshing}
+        if len(next_refreshes) == 0:
+            self.next_refresh = None
+            return
+
+        self.next_refresh = max(min(next_refreshes.values()), now) + self._delay
+        _LOGGER.debug("%s: scheduling an update at %s (next_refreshes=%s)", self._name, self.next_refresh,
+                      next_refreshes)
+        self._unsub = event.async_track_point_in_utc_time(self.hass, self.__job, self.next_refresh)
+
+    async def _handle_refresh(self, _now: datetime) -> None:
+        self._unsub = None
+        now = utcnow()
+        due = [c for c in self._coordinators if c.active and not c.refreshing and c.next_refresh(now) <= now]
 
-        self._omie_schedule_refresh()
+        # each refresh schedules the next one once it is done
+        await asyncio.gather(*[c._handle_refresh_interval() for c in due])
+        if len(due) == 0:
+            self.async_schedule()
 
-    def _omie_schedule_refresh(self):
-        cet_hour, cet_minute = self._none_before
-        now_cet = utcnow().astimezone(CET)
-        none_before = now_cet.replace(hour=cet_hour, minute=cet_minute, second=self._schedule_second,
-                                      microsecond=self._schedule_microsecond)
-        in_15m = now_cet + timedelta(minutes=15)
-        next_quarter_hour = in_15m.replace(minute=in_15m.minute // 15 * 15, second=self._schedule_second,
-                                           microsecond=self._schedule_microsecond)
 
-        # next hour or the none_before time, whichever is soonest
-        next_refresh = (none_before if cet_hour == now_cet.hour and none_before > now_cet else next_quarter_hour).astimezone()
+async def async_remove_stored_results(hass: HomeAssistant, name: str) -> None:
+    """Removes the results persisted by the coordinator with the given name."""
+    await results_store(hass, name).async_remove()
 
-        _LOGGER.debug("%s: _schedule_refresh scheduling an update at %s (none_before=%s, next_quarter_hour=%s)", self.name,
-                      next_refresh, none_before, next_quarter_hour)
-        self._unsub_refresh = event.async_track_point_in_utc_time(self.hass, self.__job, next_refresh)
 
-    def _wait_for_none_before(self) -> bool:
-        """Whether the coordinator should wait for `none_before`."""
-        cet_now = utcnow().astimezone(tz=CET)
-        cet_hour, cet_minute = self._none_before
-        none_before = cet_now.replace(
-            hour=cet_hour,
-            minute=cet_minute,
-            second=self._schedule_second,
-            microsecond=self._schedule_microsecond)
+def results_store(hass: HomeAssistant, name: str) -> Store[dict[str, Any]]:
+    """Returns the store in which the coordinator with the given name persists its results."""
+    return Store[dict[str, Any]](hass, STORAGE_VERSION, f'{DOMAIN}.{name}')
 
-        return cet_now < none_before and none_before.date() == cet_now.date()
 
-    def _data_is_fresh(self) -> bool:
-        return self.data is not None and self.data.market_date == self._market_date() and (
-                self.update_interval is None or utcnow() < (self.data.updated_at + self.update_interval))
+async def spot_price(client_session: ClientSession,
+                     market_date: date,
+                     validators: Validators | None,
+                     base_url: str = OMIE_BASE_URL) -> Fetched[SpotData]:
+    """Fetches the marginal price data for a given date."""
+    if market_date < QUARTER_HOURLY_START_DATE:
+        raise ValueError(f"Dates earlier than {QUARTER_HOURLY_START_DATE} are not supported.")
 
+    dc = DateComponents.decompose(market_date)
+    url = f"{base_url}/sites/default/files/dados/AGNO_{dc.yy}/MES_{dc.MM}/TXT/INT_PBC_EV_H_1_{dc.dd_MM_yy}_{dc.dd_MM_yy}.TXT"
+    return await fetch_market_file(client_session, url, market_date, _spot_data, validators)
 
-def spot_price(client_session: ClientSession, get_market_date: DateFactory) -> UpdateMethod[SpotData]:
-    async def fetch() -> OMIEResults[SpotData]:
-        return await pyomie_spot(client_session, get_market_date())
 
-    return fetch
+def _spot_data(url: str, market_date: date, header: str, s: OMIEFile) -> SpotData:
+    return SpotData(
+        header=header,
+        market_date=market_date.isoformat(),
+        url=url,
+        es_pt_total_power=s["Potencia total con bilaterales del mercado Ibérico (MW)"],
+        es_purchases_power=s["Potencia total de compra sistema español (MW)"],
+        pt_purchases_power=s["Potencia total de compra sistema portugués (MW)"],
+        es_sales_power=s["Potencia total de venta sistema español (MW)"],
+        pt_sales_power=s["Potencia total de venta sistema portugués (MW)"],
+        es_pt_power=s["Potencia total del mercado Ibérico (MW)"],
+        es_to_pt_exports_power=s["Exportación de España a Portugal (MW)"],
+        es_from_pt_imports_power=s["Importación de España desde Portugal (MW)"],
+        es_spot_price=s["Precio marginal en el sistema español (EUR/MWh)"],
+        pt_spot_price=s["Precio marginal en el sistema portugués (EUR/MWh)"],
+    )
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .model import OMIECoordinators, OMIEData
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry: what is held, when it will be fetched next and how long things take."""
+    data: OMIEData = hass.data[DOMAIN]
+    coordinators: OMIECoordinators = data.entries[entry.entry_id]
+    return {
+        "options": dict(entry.options),
+        "coordinators": {key: c.diagnostics() for key, c in coordinators.coordinators.items()},
+        "views": {key: v.stats.as_dict() for key, v in coordinators.views.items()},
+        "entities": {entity_id: stats.as_dict() for entity_id, stats in sorted(coordinators.entity_stats.items())},
+        "archive": coordinators.archive.diagnostics() if coordinators.archive is not None else None,
+        "forecast": coordinators.forecaster.diagnostics() if coordinators.forecaster is not None else None,
+        "transitions": coordinators.transitions.diagnostics() if coordinators.transitions is not None else None,
+        "shared_fetches": data.fetch_cache.diagnostics(),
+    }
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_NAME
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceEntryType
+from homeassistant.helpers.entity import DeviceInfo
+from homeassistant.util import slugify
+
+from .const import DOMAIN
+from .translations import DEVICE_NAMES
+
+OBJECT_PREFIX = "omie"
+"""Prefix of the unique ids and entity ids of the first config entry."""
+
+
+def entry_device_info(hass: HomeAssistant, entry: ConfigEntry) -> DeviceInfo:
+    """Returns the device that groups a config entry's entities."""
+    device_names = DEVICE_NAMES.get_all(hass.config.language)
+    return DeviceInfo(
+        configuration_url=f"https://www.omie.es/{DEVICE_NAMES.lang(hass.config.language)}/market-results",
+        entry_type=DeviceEntryType.SERVICE,
+        identifiers={(DOMAIN, entry.entry_id)},
+        manufacturer=device_names.device_manufacturer,
+        name=entry.title if CONF_NAME in entry.data else device_names.device_name,
+        model=device_names.device_model,
+    )
+
+
+def entry_object_prefix(entry: ConfigEntry) -> str:
+    """Returns the prefix of a config entry's unique ids and entity ids.
+
+    The first entry has no name, which keeps the entity ids that it always had.
+    """
+    return name_object_prefix(entry.data[CONF_NAME]) if CONF_NAME in entry.data else OBJECT_PREFIX
+
+
+def name_object_prefix(name: str) -> str:
+    """Returns the prefix of the unique ids and entity ids of a config entry with the given name. Names that only differ
+    in case or punctuation get the same prefix, and names with no usable characters get the first entry's."""
+    return slugify(f"{OBJECT_PREFIX}_{name}")
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import asyncio
+import csv
+import hashlib
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import NamedTuple, Generic, TypeVar, Callable, Awaitable, Hashable, Any
+
+from aiohttp import ClientSession, ClientResponseError, hdrs
+from homeassistant.util import utcnow
+from pyomie.model import OMIEResults
+
+from .model import OMIEFile
+from .stats import Stats, elapsed_ms
+
+_LOGGER = logging.getLogger(__name__)
+
+_DataT = TypeVar("_DataT")
+
+DEFAULT_TIMEOUT = timedelta(seconds=10)
+
+_MAX_QUARTER_HOURS_IN_DAY = 25 * 4
+"""Max number of quarter-hours in a day (on the day that DST ends)."""
+
+_ENCODING = "iso-8859-1"
+"""Encoding of the OMIE files."""
+
+_SHARED_FETCH_TTL = timedelta(minutes=5)
+"""How long the outcome of a fetch is kept for the coordinators of other config entries, which retry on their own schedules."""
+
+
+class Validators(NamedTuple):
+    """What is known about the last version of a market file that was received."""
+    etag: str | None = None
+    """The `ETag` response header."""
+
+    last_modified: str | None = None
+    """The `Last-Modified` response header."""
+
+    digest: str | None = None
+    """SHA-256 of the response body."""
+
+
+class Fetched(NamedTuple, Generic[_DataT]):
+    """Outcome of a conditional fetch."""
+    results: OMIEResults[_DataT] | None
+    """The new results, or None if the file has not changed since `validators` were obtained."""
+
+    validators: Validators
+    """Validators to use in the next fetch of the same file."""
+
+    downloaded: int = 0
+    """Number of bytes received in the response body."""
+
+    parse_ms: float = 0.0
+    """Milliseconds spent parsing the file."""
+
+
+async def fetch_market_file(client_session: ClientSession,
+                            url: str,
+                            market_date: date,
+                            parse: Callable[[str, date, str, OMIEFile], _DataT],
+                            validators: Validators | None) -> Fetched[_DataT]:
+    """Fetches an OMIE market file unless it is known to be unchanged since `validators` were obtained.
+
+    Unchanged files are detected either by the server responding `304 Not Modified` to a conditional request or by the
+    body being byte-identical to the previous one, in which case it is not parsed again.
+    """
+    headers = {}
+    if validators is not None and validators.etag is not None:
+        headers[hdrs.IF_NONE_MATCH] = validators.etag
+    if validators is not None and validators.last_modified is not None:
+        headers[hdrs.IF_MODIFIED_SINCE] = validators.last_modified
+
+    async with client_session.get(url, headers=headers, timeout=DEFAULT_TIMEOUT.total_seconds()) as resp:
+        if resp.status == 304:
+            if validators is None:
+                # nothing was cached to fall back on, so there is nothing to serve
+                raise ClientResponseError(resp.request_info, resp.history, status=resp.status,
+                                          message="Not Modified without a cached copy", headers=resp.headers)
+            _LOGGER.debug("fetch_market_file: %s not modified", url)
+            return Fetched(results=None, validators=validators)
+
+        resp.raise_for_status()
+        body = await resp.read()
+        new_validators = Validators(
+            etag=resp.headers.get(hdrs.ETAG),
+            last_modified=resp.headers.get(hdrs.LAST_MODIFIED),
+            digest=hashlib.sha256(body).hexdigest(),
+        )
+
+    if validators is not None and validators.digest == new_validators.digest:
+        _LOGGER.debug("fetch_market_file: %s unchanged (sha256=%s)", url, new_validators.digest)
+        return Fetched(results=None, validators=new_validators, downloaded=len(body))
+
+    started = time.perf_counter()
+    raw = body.decode(_ENCODING)
+    header, series = parse_market_file(raw)
+    contents = parse(url, market_date, header, series)
+    return Fetched(
+        results=OMIEResults(
+            updated_at=utcnow(),
+            market_date=market_date,
+            contents=contents,
+            raw=raw,
+        ),
+        validators=new_validators,
+        downloaded=len(body),
+        parse_ms=elapsed_ms(started),
+    )
+
+
+class _SharedFetch(NamedTuple):
+    started_at: datetime
+    """When the request was made."""
+
+    validators: Validators | None
+    """Validators that the request was made with."""
+
+    task: asyncio.Future[Fetched]
+    """The fetch, which may still be in flight."""
+
+
+class OMIEFetchCache:
+    """Shares the fetches of the same market file between the coordinators of every config entry.
+
+    A fetch that is in flight, or that started after everything that another coordinator already knows about, is as good
+    as making that fetch again: the other coordinator gets its outcome instead, so that any number of config entries
+    make as many requests to OMIE as one of them.
+    """
+
+    def __init__(self) -> None:
+        self._fetches: dict[tuple[Hashable, date], _SharedFetch] = {}
+        self.stats = Stats()
+
+    async def async_fetch(self,
+                          source: Hashable,
+                          market_date: date,
+                          validators: Validators | None,
+                          now: datetime,
+                          since: datetime | None,
+                          fetch: Callable[[Validators | None], Awaitable[Fetched[_DataT]]]) -> Fetched[_DataT]:
+        """Returns the outcome of `fetch(validators)`, reusing that of a fetch that started after `since` if there is one.
+
+        `now` is the time at which the caller considers the file to be checked, which is recorded as the start of the fetch
+        if one is made: a caller whose `since` is that time does not get the outcome of its own previous fetch back.
+        """
+        self._prune(now)
+
+        key = (source, market_date)
+        shared = self._fetches.get(key)
+        if shared is not None and (since is None or shared.started_at > since):
+            fetched = await asyncio.shield(shared.task)
+            if fetched.results is not None:
+                # whatever was downloaded counts against the coordinator that made the request
+                self.stats.count("shared")
+                return Fetched(None if fetched.validators == validators else fetched.results, fetched.validators)
+            if validators == shared.validators:
+                self.stats.count("shared")
+                return Fetched(None, fetched.validators)
+            # unchanged since a version that this coordinator does not hold
+
+        self.stats.count("requests")
+        task = asyncio.ensure_future(fetch(validators))
+        # the outcome is retrieved here even if no coordinator is left waiting for it
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._fetches[key] = _SharedFetch(now, validators, task)
+        return await asyncio.shield(task)
+
+    def _prune(self, now: datetime) -> None:
+        for key in [k for k, f in self._fetches.items() if f.task.done() and now - f.started_at > _SHARED_FETCH_TTL]:
+            del self._fetches[key]
+
+    def diagnostics(self) -> dict[str, Any]:
+        return {
+            "fetches": {f"{source}/{market_date.isoformat()}": f.started_at.isoformat()
+                        for (source, market_date), f in self._fetches.items()},
+            "stats": self.stats.as_dict(),
+        }
+
+
+def parse_market_file(raw: str) -> tuple[str, OMIEFile]:
+    """Parses the text of an OMIE market file into its header and a dict of quarter-hourly series."""
+    lines = raw.splitlines()
+    header = lines[0]
+    rows = list(csv.reader(lines[3:], delimiter=";", skipinitialspace=True))
+    columns = range(1, _MAX_QUARTER_HOURS_IN_DAY + 1)
+
+    return header, {
+        row[0]: [_to_float(row[column]) for column in columns if len(row) > column and row[column]]
+        for row in rows
+        if len(row) > 0
+    }
+
+
+def _to_float(n: str) -> float:
+    return float(n.replace(",", "."))
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from array import array
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Any, Sequence, TYPE_CHECKING
+
+from homeassistant.core import HomeAssistant, callback, CALLBACK_TYPE
+from homeassistant.util import utcnow
+from pyomie.model import SpotData
+
+from .const import CET
+from .coordinator import OMIEMarketCoordinator
+from .model import OMIEMarketWindow
+from .series import QuarterHourSeries, local_midnight
+
+if TYPE_CHECKING:
+    from .archive import OMIEArchive
+
+_LOGGER = logging.getLogger(__name__)
+
+_SLOTS = 24 * 4
+"""Quarter-hours of the CET clock, which a market day's quarter-hours are mapped onto."""
+
+_WEEKDAY, _SATURDAY, _SUNDAY = 0, 1, 2
+
+_LEVEL_WEIGHT = 0.3
+"""Weight of the latest day in the level, so that it follows the recent daily averages."""
+
+_OFFSET_WEIGHT = 0.2
+"""Weight of the latest day of a type in that type's offset from the level."""
+
+_SHAPE_WEIGHT = 0.15
+"""Weight of the latest day of a type in that type's intraday shape."""
+
+_HISTORY = timedelta(days=8 * 7)
+"""How far back the archive is read to seed the models."""
+
+FORECAST_DAYS = 3
+"""Market days after today that are forecast, enough to cover the day after tomorrow in any local time zone."""
+
+
+class ProfileModel:
+    """Seasonal profile of one series: a level that follows the recent daily averages, plus an offset from it and an
+    intraday shape for each type of day (weekday, Saturday, Sunday).
+
+    Everything is exponentially weighted, so each complete market day updates the model in one pass over its
+    quarter-hours and there is nothing to refit.
+    """
+    __slots__ = ("level", "offsets", "shapes", "days")
+
+    def __init__(self) -> None:
+        self.level: float | None = None
+        self.offsets = [0.0, 0.0, 0.0]
+        self.shapes = [array('d', [0.0]) * _SLOTS for _ in range(3)]
+        self.days = [0, 0, 0]
+
+    def update(self, market_date: date, series: QuarterHourSeries) -> bool:
+        """Learns from a market day's values. Returns False (learning nothing) if any of them are missing."""
+        if not series.complete():
+            return False
+
+        mean = math.fsum(series.values) / len(series)
+        day_type = _day_type(market_date)
+        first = self.days[day_type] == 0
+        self.level = mean if self.level is None else self.level + _LEVEL_WEIGHT * (mean - self.level)
+        self.offsets[day_type] += (1 if first else _OFFSET_WEIGHT) * ((mean - self.level) - self.offsets[day_type])
+
+        shape = self.shapes[day_type]
+        for slot, value in zip(_clock_slots(market_date), series.values):
+            shape[slot] += (1 if first else _SHAPE_WEIGHT) * ((value - mean) - shape[slot])
+
+        self.days[day_type] += 1
+        return True
+
+    def predict(self, market_date: date) -> QuarterHourSeries | None:
+        """Returns the expected values for a market day, or None if nothing has been learnt yet."""
+        if self.level is None:
+            return None
+
+        day_type = _day_type(market_date)
+        if self.days[day_type] == 0:
+            # not seen yet: borrow the most familiar type of day
+            day_type = max(range(3), key=lambda t: self.days[t])
+
+        base, shape = self.level + self.offsets[day_type], self.shapes[day_type]
+        return QuarterHourSeries.market_day(market_date, array('d', (round(base + shape[slot], 2) for slot in _clock_slots(market_date))))
+
+
+class OMIEForecaster:
+    """Forecasts the series of a coordinator for the market days that are not published yet.
+
+    The models learn from every complete day that the coordinator holds, the first time that a forecast is requested
+    after it appeared. If there is an archive then they are first seeded from its recent history, in the background.
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator: OMIEMarketCoordinator, archive: OMIEArchive | None,
+                 series: Sequence[str]) -> None:
+        self.hass = hass
+        self.coordinator = coordinator
+        self.models = {s: ProfileModel() for s in series}
+        self.version = 0
+        self._archive = archive
+        self._ready = archive is None
+        self._learnt_until: date | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    @callback
+    def async_setup(self) -> CALLBACK_TYPE:
+        """Seeds the models from the archive in the background, if there is one. Returns a callback that stops it."""
+        if self._archive is not None:
+            task = self.hass.async_create_background_task(self._async_seed(), f"{self.coordinator.name} forecast seed")
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        @callback
+        def stop() -> None:
+            for t in self._tasks:
+                t.cancel()
+
+        return stop
+
+    def learn(self, window: OMIEMarketWindow[SpotData] | None) -> None:
+        """Learns from the complete days in the window that have not been learnt from yet, oldest first."""
+        if not self._ready or window is None:
+            return
+
+        for market_date, results in sorted(window.results.items()):
+            if self._learnt_until is None or market_date > self._learnt_until:
+                self._learn(market_date, {s: QuarterHourSeries.market_day(market_date, getattr(results.contents, s)) for s in self.models})
+
+    def predict(self, series: str, market_date: date) -> QuarterHourSeries | None:
+        """Returns the forecast of a series for a market date, or None if there is none yet."""
+        return self.models[series].predict(market_date) if self._ready else None
+
+    def diagnostics(self) -> dict[str, Any]:
+        return {
+            "ready": self._ready,
+            "learnt_until": self._learnt_until.isoformat() if self._learnt_until is not None else None,
+            "models": {s: {"level": m.level, "days": m.days} for s, m in self.models.items()},
+        }
+
+    def _learn(self, market_date: date, days: dict[str, QuarterHourSeries]) -> None:
+        # days with missing values are skipped altogether so that the models stay in step
+        if all(day.complete() for day in days.values()):
+            for s, day in days.items():
+                self.models[s].update(market_date, day)
+            self._learnt_until = market_date
+            self.version += 1
+
+    async def _async_seed(self) -> None:
+        window = self.coordinator.data
+        end = min(window.results) if window is not None and window.results else _cet_today()
+        start = end - _HISTORY
+        history = {s: await self._archive.async_series(s, start, end) for s in self.models}
+
+        for market_date in (start + timedelta(days=i) for i in range((end - start).days)):
+            day_start, day_end = local_midnight(market_date, CET), local_midnight(market_date + timedelta(days=1), CET)
+            self._learn(market_date, {s: h.slice(day_start, day_end) for s, h in history.items()})
+
+        _LOGGER.debug("%s: forecast models seeded up to %s", self.coordinator.name, self._learnt_until)
+        self._ready = True
+        # let the entities pick up the forecast
+        self.coordinator.async_update_listeners()
+
+
+def _day_type(market_date: date) -> int:
+    weekday = market_date.weekday()
+    return _SUNDAY if weekday == 6 else _SATURDAY if weekday == 5 else _WEEKDAY
+
+
+@lru_cache(maxsize=16)
+def _clock_slots(market_date: date) -> tuple[int, ...]:
+    """Returns the CET clock quarter-hour of each of the market day's quarter-hours, which repeat or skip around DST."""
+    day = QuarterHourSeries.span(local_midnight(market_date, CET), local_midnight(market_date + timedelta(days=1), CET), [])
+    return tuple((local.hour * 60 + local.minute) // 15 for local in (i.astimezone(CET) for i in day.instants()))
+
+
+def _cet_today() -> date:
+    return utcnow().astimezone(CET).date()
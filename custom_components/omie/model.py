@@ -1,11 +1,23 @@
 from __future__ import annotations
 
 import logging
-from typing import NamedTuple, Union, TypeVar, Generic
+from datetime import date, timedelta
+from typing import NamedTuple, Union, TypeVar, Generic, Any, TYPE_CHECKING
 
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
 from pyomie.model import OMIEResults
 
+from .stats import Stats
+
+if TYPE_CHECKING:
+    from homeassistant.helpers.storage import Store
+
+    from .archive import OMIEArchive
+    from .coordinator import OMIEMarketCoordinator, OMIEFetchScheduler
+    from .fetch import OMIEFetchCache
+    from .forecast import OMIEForecaster
+    from .transitions import OMIETransitionTracker
+    from .view import OMIEMarketView
+
 _LOGGER = logging.getLogger(__name__)
 
 OMIEFile = dict[str, Union[float, list[float]]]
@@ -14,18 +26,70 @@ OMIEFile = dict[str, Union[float, list[float]]]
 _DataT = TypeVar("_DataT")
 
 
-class OMIESources(NamedTuple, Generic[_DataT]):
-    """Pair of coordinators that source OMIE market results for today and tomorrow."""
-    today: DataUpdateCoordinator[OMIEResults[_DataT]]
-    """Today's market results (CET)."""
+class OMIEMarketWindow(NamedTuple, Generic[_DataT]):
+    """Market results for a window of consecutive market dates (CET), as held by an `OMIEMarketCoordinator`."""
+    market_date: date
+    """Today's market date (CET)."""
+
+    results: dict[date, OMIEResults[_DataT]]
+    """The results held for each market date in the window. Dates whose results are not available are absent."""
+
+    @property
+    def today(self) -> OMIEResults[_DataT] | None:
+        """Today's market results (CET)."""
+        return self.results.get(self.market_date)
 
-    tomorrow: DataUpdateCoordinator[OMIEResults[_DataT]]
-    """Tomorrow's market results (CET)."""
+    @property
+    def tomorrow(self) -> OMIEResults[_DataT] | None:
+        """Tomorrow's market results (CET)."""
+        return self.results.get(self.market_date + timedelta(days=1))
 
-    yesterday: DataUpdateCoordinator[OMIEResults[_DataT]]
-    """Yesterday's market results (CET)."""
+    @property
+    def yesterday(self) -> OMIEResults[_DataT] | None:
+        """Yesterday's market results (CET)."""
+        return self.results.get(self.market_date - timedelta(days=1))
 
 
 class OMIECoordinators(NamedTuple):
-    spot: OMIESources
-    """Spot prices."""
+    coordinators: dict[str, OMIEMarketCoordinator]
+    """Coordinator of each source, by source key. All of them share one fetch scheduler."""
+
+    views: dict[str, OMIEMarketView]
+    """Localized view of each source, by source key, shared by all entities."""
+
+    entity_stats: dict[str, Stats]
+    """Instrumentation of each entity, by entity id."""
+
+    archive: OMIEArchive | None
+    """Long-term archive of the spot prices, if enabled."""
+
+    forecaster: OMIEForecaster | None
+    """Forecast of the spot prices that are not published yet, if enabled."""
+
+    transitions: OMIETransitionTracker | None
+    """When the spot prices cross the thresholds or enter or leave the cheapest share of the day, if any are set."""
+
+    @property
+    def spot(self) -> OMIEMarketCoordinator:
+        """Spot prices."""
+        return self.coordinators["spot"]
+
+    @property
+    def spot_view(self) -> OMIEMarketView:
+        """Localized view of the spot prices."""
+        return self.views["spot"]
+
+
+class OMIEData(NamedTuple):
+    """What the integration keeps in `hass.data`, shared by every config entry."""
+    fetch_cache: OMIEFetchCache
+    """Fetches shared by the coordinators of every config entry."""
+
+    scheduler: OMIEFetchScheduler
+    """Timer that wakes up the coordinators of every source and config entry together."""
+
+    stores: dict[str, Store[dict[str, Any]]]
+    """Where the coordinators of each source persist the results that they all hold, by source key."""
+
+    entries: dict[str, OMIECoordinators]
+    """What each loaded config entry set up, by entry id. The shared data is dropped when the last of them is unloaded."""
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple, Iterable
+
+from .const import CET
+
+
+class MarketSession(NamedTuple):
+    """An OMIE market session, when its results are published and which market dates they change."""
+    name: str
+    """Session name."""
+
+    published: time
+    """Publication time in the CET timezone plus 10 minutes."""
+
+    changes: frozenset[int]
+    """Market dates whose results change, as offsets from the date on which the session is published (0 = same day)."""
+
+    def publication(self, market_date: date) -> list[datetime]:
+        """Returns the instants at which this session changes the results for the given market date."""
+        return [CET.localize(datetime.combine(market_date - timedelta(days=offset), self.published)) for offset in self.changes]
+
+
+# language=Markdown
+#
+# OMIE market sessions and the values that they influence. Time shown below is publication time in the CET timezone plus 10 minutes.
+#
+# ```
+# | Time  | Name        | Spot | Adj  | Spot+1 | Ajd+1 |
+# |-------|-------------|------|------|--------|-------|
+# | 02:30 | Intraday 4  |  X   |  X   |        |       |
+# | 05:30 | Intraday 5  |  X   |  X   |        |       |
+# | 10:30 | Intraday 6  |  X   |  X   |        |       |
+# | 13:30 | Day-ahead   |      |      |   X    |   X   |
+# | 16:30 | Intraday 1  |      |      |   X    |   X   |
+# | 18:30 | Intraday 2  |  X   |  X   |   X    |   X   |
+# | 22:30 | Intraday 3  |      |      |   X    |   X   |
+# ```
+#
+# References:
+# - https://www.omie.es/en/mercado-de-electricidad
+# - https://www.omie.es/sites/default/files/inline-files/intraday_and_continuous_markets.pdf
+#
+# Only the day-ahead session changes the spot file, which is the only one that is fetched.
+DAY_AHEAD = MarketSession("Day-ahead", time(13, 30), frozenset({1}))
+
+
+def publications(sessions: Iterable[MarketSession], market_date: date) -> list[datetime]:
+    """Returns the sorted instants at which any of the sessions change the results for the given market date."""
+    return sorted(p for s in sessions for p in s.publication(market_date))
+
+
+def last_publication(sessions: Iterable[MarketSession], market_date: date, now: datetime) -> datetime | None:
+    """Returns the latest instant not after `now` at which the results for the given market date changed."""
+    return max((p for p in publications(sessions, market_date) if p <= now), default=None)
+
+
+def next_publication(sessions: Iterable[MarketSession], market_date: date, now: datetime) -> datetime | None:
+    """Returns the earliest instant after `now` at which the results for the given market date will change."""
+    return min((p for p in publications(sessions, market_date) if p > now), default=None)
@@ -1,159 +1,264 @@
 from __future__ import annotations
 
 import logging
-import statistics
-from datetime import datetime, timedelta, tzinfo, date
+import time
+from datetime import tzinfo, date, datetime, timedelta
+from typing import Any
 
-import pytz
-from homeassistant.components.sensor import SensorEntity, SensorStateClass
+from homeassistant.components.sensor import SensorEntity, SensorStateClass, SensorDeviceClass
 from homeassistant.config_entries import (ConfigEntry)
 from homeassistant.const import CURRENCY_EURO, EVENT_CORE_CONFIG_UPDATE
-from homeassistant.const import UnitOfEnergy
+from homeassistant.const import UnitOfEnergy, UnitOfTime, EntityCategory
 from homeassistant.core import HomeAssistant, callback
-from homeassistant.helpers.device_registry import DeviceEntryType
-from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_track_utc_time_change, async_track_time_interval
+from homeassistant.helpers.json import json_bytes
 from homeassistant.util import slugify, utcnow
-from pyomie.model import SpotData, OMIEResults
-from pyomie.util import localize_quarter_hourly_data
+from homeassistant.util import dt as dt_util
 
-from . import OMIECoordinators
-from .const import DOMAIN, CET
-from .model import OMIESources
-from .translations import ENTITY_NAMES, DEVICE_NAMES
+from . import OMIECoordinators, OMIEData
+from .const import DOMAIN, CONF_PRICE_ATTRIBUTES, DEFAULT_PRICE_ATTRIBUTES, PRICE_ATTRIBUTES_FULL, CONF_CHEAPEST_WINDOW, \
+    DEFAULT_CHEAPEST_WINDOW, CONF_DIAGNOSTIC_SENSORS, DEFAULT_DIAGNOSTIC_SENSORS, CONF_RESOLUTION, DEFAULT_RESOLUTION, \
+    TZ_LISBON, TZ_MADRID
+from .entity import entry_device_info, entry_object_prefix
+from .sources import source_of
+from .stats import Stats, elapsed_ms
+from .tariff import Tariff, tariff_from_options
+from .translations import ENTITY_NAMES
+from .view import OMIEMarketView, LocalizedPrices
 
 _LOGGER = logging.getLogger(__name__)
 
-_TZ_LISBON = pytz.timezone('Europe/Lisbon')
-_TZ_MADRID = pytz.timezone('Europe/Madrid')
+
+_DIAGNOSTICS_INTERVAL = timedelta(minutes=1)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback) -> bool:
     """Set up OMIE from its config entry."""
-    coordinators: OMIECoordinators = hass.data[DOMAIN]
-
-    device_names = DEVICE_NAMES.get_all(hass.config.language)
-    device_info = DeviceInfo(
-        configuration_url=f"https://www.omie.es/{DEVICE_NAMES.lang(hass.config.language)}/market-results",
-        entry_type=DeviceEntryType.SERVICE,
-        identifiers={(DOMAIN, entry.entry_id)},
-        manufacturer=device_names.device_manufacturer,
-        name=device_names.device_name,
-        model=device_names.device_model,
-    )
+    data: OMIEData = hass.data[DOMAIN]
+    coordinators: OMIECoordinators = data.entries[entry.entry_id]
+
+    object_prefix = entry_object_prefix(entry)
+    device_info = entry_device_info(hass, entry)
 
     entity_names = ENTITY_NAMES.get_all(hass.config.language)
+    price_attributes = entry.options.get(CONF_PRICE_ATTRIBUTES, DEFAULT_PRICE_ATTRIBUTES)
+    resolution = entry.options.get(CONF_RESOLUTION, DEFAULT_RESOLUTION)
+    diagnostic_sensors = entry.options.get(CONF_DIAGNOSTIC_SENSORS, DEFAULT_DIAGNOSTIC_SENSORS)
 
     class PriceEntity(SensorEntity):
-        def __init__(self, sources: OMIESources[SpotData], key: str, series: str, tz: tzinfo):
+        def __init__(self, view: OMIEMarketView, key: str, series: str, tz: tzinfo, tariff: Tariff | None = None):
             """Initialize the sensor."""
             self._attr_device_info = device_info
             self._attr_native_unit_of_measurement = f"{CURRENCY_EURO}/{UnitOfEnergy.MEGA_WATT_HOUR}"
             self._attr_state_class = SensorStateClass.MEASUREMENT
-            self._attr_unique_id = slugify(f'omie_{key}')
+            self._attr_unique_id = slugify(f'{object_prefix}_{key}')
             self._attr_name = getattr(entity_names, f'{key}')
             self._attr_icon = "mdi:currency-eur"
             self._attr_should_poll = False
             self._key = key
             self._series = series
-            self._sources = sources
+            self._view = view
             self._tz = tz
+            self._tariff = tariff
             self._local_tz = None
+            self._local_today: date | None = None
+            self._prices: LocalizedPrices | None = None
+            self._stats = Stats()
             self.entity_id = f"sensor.{self._attr_unique_id}"
 
         async def async_added_to_hass(self) -> None:
             """Register callbacks."""
-            self._local_tz = await self.hass.async_add_executor_job(pytz.timezone, self.hass.config.time_zone)
+            # the time zone that Home Assistant has already resolved, shared by every entity
+            self._local_tz = dt_util.get_default_time_zone()
+            coordinators.entity_stats[self.entity_id] = self._stats
+            self.async_on_remove(lambda: coordinators.entity_stats.pop(self.entity_id, None))
 
             @callback
             def update() -> None:
-                """Update this sensor's state."""
-                today_data = self._sources.today.data
-                tomorrow_data = self._sources.tomorrow.data
-                yesterday_data = self._sources.yesterday.data
+                """Update this sensor's state and attributes from the market data."""
+                started = time.perf_counter()
+                now = utcnow().astimezone(self._local_tz)
+                self._local_today = now.date()
+                self._prices = prices = self._view.localized(self._series, self._local_tz, self._local_today, self._tariff,
+                                                                 resolution)
 
-                if None in [today_data, yesterday_data]:
+                if prices is None:
                     # not all necessary data available yet
                     self._attr_native_value = None
                     self._attr_extra_state_attributes = None
                     return
 
-                cet_today_hourly_data = _localize_quarter_hourly_data(today_data, self._series)
-                cet_tomorrow_hourly_data = _localize_quarter_hourly_data(tomorrow_data, self._series)
-                cet_yesterday_hourly_data = _localize_quarter_hourly_data(yesterday_data, self._series)
-                cet_hourly_data = cet_yesterday_hourly_data | cet_today_hourly_data | cet_tomorrow_hourly_data
+                self._attr_native_value = prices.today.series.at(now)
+                self._attr_extra_state_attributes = _price_attributes(prices, price_attributes)
+                self._stats.add("update_ms", elapsed_ms(started))
+                if diagnostic_sensors:
+                    # encoding the attributes is the costliest part of a state write, so only pay for it twice when asked to
+                    self._stats.add("state_bytes", len(json_bytes(self._attr_extra_state_attributes)))
+                self.async_schedule_update_ha_state()
 
-                now = utcnow().astimezone(self._local_tz)
-                today = now.date()
-                tomorrow = today + timedelta(days=1)
+            @callback
+            def tick(now: datetime) -> None:
+                """Move this sensor's state on to the current quarter-hour."""
+                local_now = now.astimezone(self._local_tz)
+                self._stats.count("ticks")
+                if self._prices is None or local_now.date() != self._local_today:
+                    # today and tomorrow have moved on
+                    update()
+                    return
+
+                value = self._prices.today.series.at(local_now)
+                if value != self._attr_native_value:
+                    self._attr_native_value = value
+                    self._stats.count("tick_writes")
+                    self.async_write_ha_state()
 
-                local_today_hourly_data = {h: cet_hourly_data.get(h.astimezone(CET)) for h in _day_quarter_hours(today, self._local_tz)}
-                local_tomorrow_hourly_data = {h: cet_hourly_data.get(h.astimezone(CET)) for h in _day_quarter_hours(tomorrow, self._local_tz)}
-                local_start_of_quarter_hour = self._local_tz.normalize(now.replace(minute=now.minute // 15 * 15, second=0, microsecond=0))
+            @callback
+            def handle_core_config_update(event) -> None:
+                if 'time_zone' in event.data:
+                    self._local_tz = dt_util.get_default_time_zone()
+                    update()
 
-                self._attr_native_value = local_today_hourly_data.get(local_start_of_quarter_hour)
+            self.async_on_remove(self.hass.bus.async_listen(EVENT_CORE_CONFIG_UPDATE, handle_core_config_update))
+            self.async_on_remove(self._view.coordinator.async_add_listener(update))
+            self.async_on_remove(async_track_utc_time_change(self.hass, tick, minute=range(0, 60, 15), second=0))
+            # the results restored before this entity was added are not announced again unless a fetch changes them
+            update()
+
+    class CheapestWindowEntity(SensorEntity):
+        def __init__(self, view: OMIEMarketView, key: str, series: str, duration: timedelta):
+            """Initialize the sensor."""
+            self._attr_device_info = device_info
+            self._attr_device_class = SensorDeviceClass.TIMESTAMP
+            self._attr_unique_id = slugify(f'{object_prefix}_{key}')
+            self._attr_name = getattr(entity_names, f'{key}')
+            self._attr_icon = "mdi:clock-start"
+            self._attr_should_poll = False
+            self._series = series
+            self._view = view
+            self._duration = duration
+            self.entity_id = f"sensor.{self._attr_unique_id}"
+
+        async def async_added_to_hass(self) -> None:
+            """Register callbacks."""
+
+            @callback
+            def update(now: datetime | None = None) -> None:
+                """Update this sensor's state with the cheapest window from the current quarter-hour onwards."""
+                window = self._view.cheapest_window(self._series, now or utcnow(), None, self._duration)
+
+                self._attr_native_value = window.start if window else None
                 self._attr_extra_state_attributes = {
-                    'OMIE_today_average': _day_average(cet_today_hourly_data),
-                    'today_provisional': None in local_today_hourly_data.values(),
-                    'today_average': _day_average(local_today_hourly_data),
-                    'today_hours': local_today_hourly_data,
-                    'OMIE_tomorrow_average': _day_average(cet_tomorrow_hourly_data),
-                    'tomorrow_provisional': len(local_tomorrow_hourly_data) == 0 or None in local_tomorrow_hourly_data.values(),
-                    'tomorrow_average': _day_average(local_tomorrow_hourly_data),
-                    'tomorrow_hours': local_tomorrow_hourly_data if len(local_tomorrow_hourly_data) > 0 else None,
+                    'end': window.end if window else None,
+                    'average': window.average if window else None,
+                    'duration': self._duration.total_seconds() / 3600,
                 }
 
-                self.async_schedule_update_ha_state()
+                self.async_write_ha_state()
 
-            async def handle_core_config_update(event) -> None:
-                if 'time_zone' in event.data:
-                    self._local_tz = await self.hass.async_add_executor_job(pytz.timezone, self.hass.config.time_zone)
-                    update()
+            self.async_on_remove(self._view.coordinator.async_add_listener(update))
+            self.async_on_remove(async_track_utc_time_change(self.hass, update, minute=range(0, 60, 15), second=0))
+            update()
 
-            self.async_on_remove(self.hass.bus.async_listen(EVENT_CORE_CONFIG_UPDATE, handle_core_config_update))
-            self.async_on_remove(self._sources.today.async_add_listener(update))
-            self.async_on_remove(self._sources.tomorrow.async_add_listener(update))
-            self.async_on_remove(self._sources.yesterday.async_add_listener(update))
+    class DurationEntity(SensorEntity):
+        def __init__(self, key: str, stats: Stats, samples: str):
+            """Initialize the sensor."""
+            self._attr_device_info = device_info
+            self._attr_device_class = SensorDeviceClass.DURATION
+            self._attr_entity_category = EntityCategory.DIAGNOSTIC
+            self._attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+            self._attr_state_class = SensorStateClass.MEASUREMENT
+            self._attr_suggested_display_precision = 1
+            self._attr_unique_id = slugify(f'{object_prefix}_{key}')
+            self._attr_name = getattr(entity_names, f'{key}')
+            self._attr_icon = "mdi:timer-outline"
+            self._attr_should_poll = False
+            self._stats = stats
+            self._samples = samples
+            self.entity_id = f"sensor.{self._attr_unique_id}"
+
+        async def async_added_to_hass(self) -> None:
+            """Register callbacks."""
+
+            @callback
+            def update(now: datetime | None = None) -> None:
+                """Update this sensor's state with the 90th percentile of the recent samples."""
+                samples = self._stats.samples.get(self._samples)
+                self._attr_native_value = self._stats.percentile(self._samples, 90)
+                self._attr_extra_state_attributes = samples.as_dict() if samples is not None else None
+                # the state machine ignores writes that change nothing
+                self.async_write_ha_state()
+
+            self.async_on_remove(async_track_time_interval(self.hass, update, _DIAGNOSTICS_INTERVAL))
+            update()
 
     sensors = [
-        PriceEntity(sources=coordinators.spot, key="spot_price_pt", series="pt_spot_price", tz=_TZ_LISBON),
-        PriceEntity(sources=coordinators.spot, key="spot_price_es", series="es_spot_price", tz=_TZ_MADRID),
+        PriceEntity(view=coordinators.spot_view, key="spot_price_pt", series="pt_spot_price", tz=TZ_LISBON),
+        PriceEntity(view=coordinators.spot_view, key="spot_price_es", series="es_spot_price", tz=TZ_MADRID),
     ]
 
-    async_add_entities(sensors, update_before_add=True)
-    for c in [coordinators.spot]:
-        await c.today.async_config_entry_first_refresh()
-        await c.tomorrow.async_config_entry_first_refresh()
-        await c.yesterday.async_config_entry_first_refresh()
-
-    return True
+    cheapest_window_hours = entry.options.get(CONF_CHEAPEST_WINDOW, DEFAULT_CHEAPEST_WINDOW)
+    if cheapest_window_hours > 0:
+        sensors += [
+            CheapestWindowEntity(view=coordinators.spot_view, key="spot_price_pt_cheapest_window", series="pt_spot_price",
+                                 duration=timedelta(hours=cheapest_window_hours)),
+            CheapestWindowEntity(view=coordinators.spot_view, key="spot_price_es_cheapest_window", series="es_spot_price",
+                                 duration=timedelta(hours=cheapest_window_hours)),
+        ]
 
+    if tariff := tariff_from_options(entry.options):
+        # retail prices, computed from the same localized series as the marginal prices
+        table = tariff.period_table
+        sensors += [
+            PriceEntity(view=coordinators.views[source_of(table.series).key], key="tariff_price", series=table.series,
+                        tz=table.tz, tariff=tariff),
+        ]
 
-def _localize_quarter_hourly_data(results: OMIEResults[SpotData], series_name: str) -> dict[datetime, float]:
-    """Localize incoming quarter-hourly data to the CET timezone."""
-    if results is None:
-        return {}
+    if diagnostic_sensors:
+        sensors += [
+            # time taken to download and parse the files, and to update every entity after they changed
+            DurationEntity(key="spot_fetch_duration", stats=coordinators.spot.stats, samples="fetch_ms"),
+            DurationEntity(key="spot_update_duration", stats=coordinators.spot.stats, samples="listeners_ms"),
+        ]
 
-    market_date = results.market_date
-    quarter_hourly_data: list[float] = getattr(results.contents, series_name)
+    async_add_entities(sensors, update_before_add=True)
 
-    return {
-        datetime.fromisoformat(date_str): value
-        for date_str, value in localize_quarter_hourly_data(market_date, quarter_hourly_data).items()
-    }
+    # only the sources that entities read from are fetched
+    subscribed = dict.fromkeys(s._view.coordinator for s in sensors if isinstance(s, (PriceEntity, CheapestWindowEntity)))
+    for c in subscribed:
+        # entities start out with the restored results (if any) while the dates in the window are fetched concurrently in
+        # the background. a failed fetch is retried by the coordinator's own schedule.
+        entry.async_create_background_task(hass, c.async_refresh(), f"{c.name} refresh")
 
+    return True
 
-def _day_quarter_hours(day: date, tz) -> list[datetime]:
-    """Returns a list of every hour in the given date, normalized to the given time zone."""
-    zero = tz.localize(datetime(day.year, day.month, day.day))
-    quarter = [tz.normalize(zero + timedelta(hours=m // 4, minutes=(m % 4) * 15)) for m in range(25 * 4)]
-    return [qh for qh in quarter if qh.date() == day]  # >96th quarter-hour only occurs once a year
 
+def _price_attributes(prices: LocalizedPrices, price_attributes: str) -> dict[str, Any]:
+    """Returns the state attributes of a price sensor, with the prices at the resolution they were localized at."""
+    attributes = {
+        'OMIE_today_average': prices.omie_today_average,
+        'today_provisional': prices.today.provisional,
+        'today_average': prices.today.average,
+        'today_min': prices.today.min,
+        'today_max': prices.today.max,
+        'OMIE_tomorrow_average': prices.omie_tomorrow_average,
+        'tomorrow_provisional': prices.tomorrow.provisional,
+        'tomorrow_average': prices.tomorrow.average,
+        'tomorrow_min': prices.tomorrow.min,
+        'tomorrow_max': prices.tomorrow.max,
+    }
+    if price_attributes == PRICE_ATTRIBUTES_FULL:
+        if prices.today.quarter_hours is not None:
+            attributes['today_hours'] = prices.today.quarter_hours
+            attributes['tomorrow_hours'] = prices.tomorrow.quarter_hours if len(prices.tomorrow.quarter_hours) > 0 else None
+        if prices.today.hours is not None:
+            attributes['today_hourly'] = prices.today.hours
+            attributes['tomorrow_hourly'] = prices.tomorrow.hours if len(prices.tomorrow.hours) > 0 else None
+        if prices.forecast is not None:
+            # estimates for what is not published yet, kept apart from the published prices
+            if prices.forecast.quarter_hours is not None:
+                attributes['forecast_hours'] = prices.forecast.quarter_hours
+            if prices.forecast.hours is not None:
+                attributes['forecast_hourly'] = prices.forecast.hours
 
-def _day_average(hours_in_day: dict[datetime, float]) -> float | None:
-    """Returns the arithmetic mean of the day's prices if possible."""
-    values = [] if hours_in_day is None else list(filter(lambda elem: elem is not None, hours_in_day.values()))
-    if len(values) == 0:
-        return None
-    else:
-        return round(statistics.mean(values), 2)
+    return attributes
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import math
+from array import array
+from datetime import datetime, timedelta, date, timezone, tzinfo
+from typing import Iterable, Iterator, Any
+
+from .const import CET
+
+QUARTER_HOUR = timedelta(minutes=15)
+"""The OMIE market time unit (MTU)."""
+
+HOUR = timedelta(hours=1)
+
+_QUARTER_HOUR_SECONDS = 15 * 60
+_NAN = math.nan
+
+
+class QuarterHourSeries:
+    """A run of quarter-hourly values starting at a given instant.
+
+    Values are held in a compact `array('d')`, with NaN standing in for values that are not known. Instants are always
+    absolute (UTC), which keeps the 23- and 25-hour days around DST changes unambiguous.
+    """
+    __slots__ = ("start", "values")
+
+    start: datetime
+    """The instant at which the first value starts (UTC)."""
+
+    values: array
+    """One value per quarter-hour. NaN means missing."""
+
+    def __init__(self, start: datetime, values: array | Iterable[float | None]) -> None:
+        self.start = start.astimezone(timezone.utc)
+        self.values = values if isinstance(values, array) else array('d', (_NAN if v is None else v for v in values))
+
+    @staticmethod
+    def market_day(market_date: date, values: Iterable[float]) -> QuarterHourSeries:
+        """Creates the series for an OMIE market date, whose first quarter-hour starts at midnight CET."""
+        return QuarterHourSeries(local_midnight(market_date, CET), values)
+
+    @staticmethod
+    def span(start: datetime, end: datetime, parts: Iterable[QuarterHourSeries | None]) -> QuarterHourSeries:
+        """Creates a series covering `[start, end)` from the given parts. Later parts win where they overlap."""
+        result = QuarterHourSeries(start, array('d', [_NAN]) * _quarter_hours_between(start, end))
+        for part in parts:
+            if part is not None:
+                result._paste(part)
+        return result
+
+    @property
+    def end(self) -> datetime:
+        """The instant at which the last value ends (exclusive)."""
+        return self.start + len(self.values) * QUARTER_HOUR
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __repr__(self) -> str:
+        return f"QuarterHourSeries(start={self.start.isoformat()}, len={len(self.values)})"
+
+    def index(self, instant: datetime) -> int | None:
+        """Returns the index of the quarter-hour that contains `instant`, or None if it is outside this series."""
+        i = int((instant - self.start).total_seconds() // _QUARTER_HOUR_SECONDS)
+        return i if 0 <= i < len(self.values) else None
+
+    def at(self, instant: datetime) -> float | None:
+        """Returns the value for the quarter-hour that contains `instant`, or None if it is missing."""
+        i = self.index(instant)
+        return None if i is None else _none_if_nan(self.values[i])
+
+    def slice(self, start: datetime, end: datetime) -> QuarterHourSeries:
+        """Returns the quarter-hours in `[start, end)`, padded with NaN where outside this series."""
+        return QuarterHourSeries.span(start, end, [self])
+
+    def local_day(self, day: date, tz: tzinfo) -> QuarterHourSeries:
+        """Returns every quarter-hour in the given local day (92, 96 or 100 of them)."""
+        return self.slice(local_midnight(day, tz), local_midnight(day + timedelta(days=1), tz))
+
+    def instants(self) -> Iterator[datetime]:
+        """Yields the start of every quarter-hour in this series (UTC)."""
+        return (self.start + i * QUARTER_HOUR for i in range(len(self.values)))
+
+    def as_dict(self, tz: tzinfo) -> dict[datetime, float | None]:
+        """Returns a dict of the start of each quarter-hour in the given time zone mapped to its value or None."""
+        return dict(zip(_in_zone(self.instants(), tz), map(_none_if_nan, self.values)))
+
+    def columns(self, tz: tzinfo) -> dict[str, Any]:
+        """Returns this series as a compact columnar dict: start (in the given time zone), step in seconds and values."""
+        return {
+            "start": self.start.astimezone(tz).isoformat(),
+            "step": _QUARTER_HOUR_SECONDS,
+            "values": [_none_if_nan(v) for v in self.values],
+        }
+
+    def hourly(self) -> array:
+        """Returns the average of every run of 4 quarter-hours from the start, rounded to 2 decimal places.
+
+        These are the hourly averages for series that start on the hour, such as local days, and 23- and 25-hour days
+        simply have 23 or 25 of them. An hour is NaN if none of its quarter-hours are known.
+        """
+        values = self.values
+        hours = array('d', [_NAN]) * -(-len(values) // 4)
+        for h in range(len(hours)):
+            known = [v for v in values[h * 4:h * 4 + 4] if v == v]
+            if known:
+                hours[h] = round(math.fsum(known) / len(known), 2)
+        return hours
+
+    def as_hourly_dict(self, tz: tzinfo) -> dict[datetime, float | None]:
+        """Returns a dict of the start of each hour in the given time zone mapped to its average value or None."""
+        hourly = self.hourly()
+        return dict(zip(_in_zone((self.start + h * HOUR for h in range(len(hourly))), tz), map(_none_if_nan, hourly)))
+
+    def known_end(self) -> datetime:
+        """Returns the instant at which the last known value ends, or the start if no values are known."""
+        i = len(self.values)
+        while i > 0 and self.values[i - 1] != self.values[i - 1]:
+            i -= 1
+        return self.start + i * QUARTER_HOUR
+
+    def known(self) -> list[float]:
+        """Returns the values that are not missing."""
+        return [v for v in self.values if v == v]
+
+    def complete(self) -> bool:
+        """Whether this series is non-empty and has no missing values."""
+        return len(self.values) > 0 and not any(v != v for v in self.values)
+
+    def average(self) -> float | None:
+        """Returns the arithmetic mean of the known values, rounded to 2 decimal places."""
+        known = self.known()
+        return round(math.fsum(known) / len(known), 2) if known else None
+
+    def min(self) -> float | None:
+        """Returns the lowest known value."""
+        return min(self.known(), default=None)
+
+    def max(self) -> float | None:
+        """Returns the highest known value."""
+        return max(self.known(), default=None)
+
+    def _paste(self, other: QuarterHourSeries) -> None:
+        offset = _quarter_hours_between(self.start, other.start)
+        lo, hi = max(0, offset), min(len(self.values), offset + len(other.values))
+        if lo < hi:
+            self.values[lo:hi] = other.values[lo - offset:hi - offset]
+
+
+def local_midnight(day: date, tz: tzinfo) -> datetime:
+    """Returns the instant (UTC) at which the given day starts in the given time zone, which may be a pytz or a zoneinfo
+    time zone."""
+    local = tz.localize(datetime(day.year, day.month, day.day)) if hasattr(tz, 'localize') \
+        else datetime(day.year, day.month, day.day, tzinfo=tz)
+    return local.astimezone(timezone.utc)
+
+
+def floor_quarter_hour(instant: datetime) -> datetime:
+    """Returns the start of the quarter-hour that contains `instant`."""
+    return instant.replace(minute=instant.minute // 15 * 15, second=0, microsecond=0)
+
+
+def _quarter_hours_between(start: datetime, end: datetime) -> int:
+    # datetimes that share a zoneinfo tzinfo subtract by wall clock, which is off by an hour across a DST change
+    return int((end.astimezone(timezone.utc) - start.astimezone(timezone.utc)).total_seconds() // _QUARTER_HOUR_SECONDS)
+
+
+def _in_zone(instants: Iterable[datetime], tz: tzinfo) -> Iterator[datetime]:
+    """Yields the instants in the given time zone, each with a fixed-offset tzinfo.
+
+    Datetimes that share a zoneinfo tzinfo compare (and hash) by wall clock, so both runs of the hour that is repeated
+    when DST ends would otherwise be the same dict key.
+    """
+    zones: dict[timedelta, timezone] = {}
+    for instant in instants:
+        local = instant.astimezone(tz)
+        offset = local.utcoffset()
+        zone = zones.get(offset) or zones.setdefault(offset, timezone(offset))
+        yield local.replace(tzinfo=zone)
+
+
+def _none_if_nan(value: float) -> float | None:
+    return None if value != value else value
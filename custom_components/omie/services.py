@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import logging
+import math
+from datetime import datetime, timedelta
+
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .model import OMIEData
+from .series import QUARTER_HOUR
+from .sources import source_of
+from .view import LocalizedDay, OMIEMarketView
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_GET_PRICES = "get_prices"
+SERVICE_CHEAPEST_WINDOW = "cheapest_window"
+SERVICE_CHEAPEST_QUARTER_HOURS = "cheapest_quarter_hours"
+
+ATTR_CONFIG_ENTRY = "config_entry"
+ATTR_COUNTRY = "country"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_DURATION = "duration"
+ATTR_COUNT = "count"
+ATTR_MOST_EXPENSIVE = "most_expensive"
+
+_COUNTRY_SERIES = {
+    "pt": "pt_spot_price",
+    "es": "es_spot_price",
+}
+"""The spot price series for each country."""
+
+
+def _whole_quarter_hours(value: timedelta) -> timedelta:
+    """Rounds a duration up to whole quarter-hours, which is how the prices are published. Rejects empty durations."""
+    if value <= timedelta(0):
+        raise vol.Invalid("duration must be longer than zero")
+    return math.ceil(value / QUARTER_HOUR) * QUARTER_HOUR
+
+
+_GET_PRICES_SCHEMA = vol.Schema({
+    vol.Required(ATTR_COUNTRY): vol.In(list(_COUNTRY_SERIES)),
+    vol.Optional(ATTR_CONFIG_ENTRY): cv.string,
+})
+
+_SEARCH_SCHEMA = _GET_PRICES_SCHEMA.extend({
+    vol.Optional(ATTR_START): cv.datetime,
+    vol.Optional(ATTR_END): cv.datetime,
+    vol.Optional(ATTR_MOST_EXPENSIVE, default=False): cv.boolean,
+})
+
+_CHEAPEST_WINDOW_SCHEMA = _SEARCH_SCHEMA.extend({
+    vol.Required(ATTR_DURATION): vol.All(cv.time_period, _whole_quarter_hours),
+})
+
+_CHEAPEST_QUARTER_HOURS_SCHEMA = _SEARCH_SCHEMA.extend({
+    vol.Required(ATTR_COUNT): cv.positive_int,
+})
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Registers the OMIE services."""
+
+    async def get_prices(call: ServiceCall) -> ServiceResponse:
+        """Returns the full price curves for today and tomorrow in Home Assistant's time zone."""
+        local_tz = dt_util.get_default_time_zone()
+        series = _COUNTRY_SERIES[call.data[ATTR_COUNTRY]]
+        prices = _view(hass, call, series).localized(series, local_tz, dt_util.utcnow().astimezone(local_tz).date())
+        if prices is None:
+            raise HomeAssistantError("OMIE prices are not available yet")
+
+        return {
+            "today": _curve(prices.today, local_tz),
+            "tomorrow": _curve(prices.tomorrow, local_tz),
+            "forecast": _curve(prices.forecast, local_tz) if prices.forecast is not None else None,
+        }
+
+    async def cheapest_window(call: ServiceCall) -> ServiceResponse:
+        """Returns the cheapest (or most expensive) contiguous window of the given duration."""
+        start, end = _search_range(call)
+        series = _COUNTRY_SERIES[call.data[ATTR_COUNTRY]]
+        window = _view(hass, call, series).cheapest_window(series, start, end, call.data[ATTR_DURATION],
+                                                           call.data[ATTR_MOST_EXPENSIVE])
+        local_tz = dt_util.get_default_time_zone()
+        return {
+            "start": window.start.astimezone(local_tz).isoformat() if window else None,
+            "end": window.end.astimezone(local_tz).isoformat() if window else None,
+            "average": window.average if window else None,
+        }
+
+    async def cheapest_quarter_hours(call: ServiceCall) -> ServiceResponse:
+        """Returns the cheapest (or most expensive) quarter-hours, which need not be contiguous."""
+        start, end = _search_range(call)
+        series = _COUNTRY_SERIES[call.data[ATTR_COUNTRY]]
+        found = _view(hass, call, series).cheapest_quarter_hours(series, start, end, call.data[ATTR_COUNT],
+                                                                 call.data[ATTR_MOST_EXPENSIVE])
+        local_tz = dt_util.get_default_time_zone()
+        return {
+            "quarter_hours": [{"start": qh.astimezone(local_tz).isoformat(), "price": price} for qh, price in found.quarter_hours]
+            if found else [],
+            "average": found.average if found else None,
+        }
+
+    hass.services.async_register(DOMAIN, SERVICE_GET_PRICES, get_prices, schema=_GET_PRICES_SCHEMA,
+                                 supports_response=SupportsResponse.ONLY)
+    hass.services.async_register(DOMAIN, SERVICE_CHEAPEST_WINDOW, cheapest_window, schema=_CHEAPEST_WINDOW_SCHEMA,
+                                 supports_response=SupportsResponse.ONLY)
+    hass.services.async_register(DOMAIN, SERVICE_CHEAPEST_QUARTER_HOURS, cheapest_quarter_hours,
+                                 schema=_CHEAPEST_QUARTER_HOURS_SCHEMA, supports_response=SupportsResponse.ONLY)
+
+
+@callback
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Removes the OMIE services."""
+    for service in [SERVICE_GET_PRICES, SERVICE_CHEAPEST_WINDOW, SERVICE_CHEAPEST_QUARTER_HOURS]:
+        hass.services.async_remove(DOMAIN, service)
+
+
+def _view(hass: HomeAssistant, call: ServiceCall, series: str) -> OMIEMarketView:
+    """Returns the view of the source that publishes the given series, in the call's config entry (by default the first
+    one that was set up)."""
+    data: OMIEData | None = hass.data.get(DOMAIN)
+    if data is None or len(data.entries) == 0:
+        raise HomeAssistantError("OMIE is not set up")
+
+    entry_id = call.data.get(ATTR_CONFIG_ENTRY, next(iter(data.entries)))
+    if entry_id not in data.entries:
+        raise HomeAssistantError(f"OMIE config entry {entry_id} is not loaded")
+
+    return data.entries[entry_id].views[source_of(series).key]
+
+
+def _search_range(call: ServiceCall) -> tuple[datetime, datetime | None]:
+    """Returns the `start` (default now) and `end` (default None) of a search, in UTC."""
+    start = dt_util.as_utc(call.data[ATTR_START]) if ATTR_START in call.data else dt_util.utcnow()
+    end = dt_util.as_utc(call.data[ATTR_END]) if ATTR_END in call.data else None
+    return start, end
+
+
+def _curve(day: LocalizedDay, tz) -> dict:
+    return {
+        **day.series.columns(tz),
+        "average": day.average,
+        "min": day.min,
+        "max": day.max,
+        "provisional": day.provisional,
+    }
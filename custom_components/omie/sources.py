@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from typing import NamedTuple, Callable, Any
+
+from pyomie.model import SpotData
+
+from .coordinator import MarketFetcher, spot_price
+from .schedule import MarketSession, DAY_AHEAD
+
+
+class OMIESource(NamedTuple):
+    """An OMIE market file that the integration can follow, and when its results are published."""
+    key: str
+    """Identifies the source. Also names its coordinator and the results persisted for it."""
+
+    market_fetcher: MarketFetcher
+    """Fetches the source's results for a market date."""
+
+    contents_type: Callable[..., Any]
+    """Type of the parsed contents, used to restore persisted results."""
+
+    sessions: tuple[MarketSession, ...]
+    """Sessions that publish (or revise) the source's results, which decide when they are fetched."""
+
+    series: tuple[str, ...]
+    """Quarter-hourly series in the contents that entities and actions can read."""
+
+
+SPOT = OMIESource(
+    key="spot",
+    market_fetcher=spot_price,
+    contents_type=SpotData,
+    # day-ahead prices are published once, by the day-ahead session of the previous day
+    sessions=(DAY_AHEAD,),
+    series=(
+        "pt_spot_price",
+        "es_spot_price",
+        "es_pt_power",
+        "es_pt_total_power",
+        "es_purchases_power",
+        "pt_purchases_power",
+        "es_sales_power",
+        "pt_sales_power",
+        "es_to_pt_exports_power",
+        "es_from_pt_imports_power",
+    ))
+"""Marginal prices and matched energy of the day-ahead market."""
+
+SOURCES: dict[str, OMIESource] = {s.key: s for s in (SPOT,)}
+"""Every source, by key. All of them share one fetch scheduler and one localized series cache."""
+
+
+def source_of(series: str) -> OMIESource:
+    """Returns the source that publishes the given series."""
+    for source in SOURCES.values():
+        if series in source.series:
+            return source
+
+    raise KeyError(series)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import math
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+_RECENT_SAMPLES = 200
+"""How many of the most recent samples are kept to work out percentiles."""
+
+
+class Samples:
+    """Measurements of something that happens repeatedly, such as a duration in milliseconds or a size in bytes."""
+    __slots__ = ("count", "total", "last", "_recent")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.last: float | None = None
+        self._recent: deque[float] = deque(maxlen=_RECENT_SAMPLES)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.last = value
+        self._recent.append(value)
+
+    def percentile(self, p: float) -> float | None:
+        """Returns the `p`th percentile (0-100) of the recent samples, or None if there are none."""
+        if len(self._recent) == 0:
+            return None
+
+        ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1)] if p > 0 else ordered[0]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": round(self.total, 3),
+            "last": _round(self.last),
+            "p50": _round(self.percentile(50)),
+            "p90": _round(self.percentile(90)),
+            "p99": _round(self.percentile(99)),
+            "max": _round(max(self._recent, default=None)),
+        }
+
+
+class Stats:
+    """Counters and samples kept by one part of the integration, exposed through diagnostics.
+
+    Names of samples carry their unit as a suffix, e.g. `fetch_ms` or `state_bytes`.
+    """
+    __slots__ = ("counters", "samples")
+
+    def __init__(self) -> None:
+        self.counters: Counter[str] = Counter()
+        self.samples: dict[str, Samples] = {}
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    def add(self, name: str, value: float) -> None:
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = Samples()
+        samples.add(value)
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[None]:
+        """Adds the time taken by the body of the `with` statement to the `name` samples, in milliseconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, elapsed_ms(started))
+
+    def percentile(self, name: str, p: float) -> float | None:
+        samples = self.samples.get(name)
+        return _round(samples.percentile(p)) if samples is not None else None
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "samples": {name: s.as_dict() for name, s in sorted(self.samples.items())},
+        }
+
+
+def elapsed_ms(started: float) -> float:
+    """Returns the milliseconds elapsed since `started`, which was obtained from `time.perf_counter()`."""
+    return (time.perf_counter() - started) * 1000
+
+
+def _round(value: float | None) -> float | None:
+    return None if value is None else round(value, 3)
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+from array import array
+from functools import lru_cache
+from datetime import datetime, tzinfo, time
+from typing import NamedTuple, Callable, Mapping, Any
+
+from .const import CONF_TARIFF, CONF_TARIFF_MULTIPLIER, CONF_TARIFF_ADDER, CONF_TARIFF_ACCESS, CONF_TARIFF_VAT, \
+    TARIFF_NONE, TZ_LISBON, TZ_MADRID
+from .series import QuarterHourSeries, QUARTER_HOUR
+
+
+class PeriodTable(NamedTuple):
+    """Time-of-use periods of a grid access tariff, which follow the local time of the country that it applies to."""
+    key: str
+    """Identifies the table in the options."""
+
+    series: str
+    """The spot price series of the country."""
+
+    tz: tzinfo
+    """Time zone in which the periods are defined."""
+
+    periods: tuple[str, ...]
+    """Names of the periods, in the order in which their access charges are given."""
+
+    period_of: Callable[[datetime], int]
+    """Returns the index of the period that contains the given local instant."""
+
+    def period_indices(self, series: QuarterHourSeries) -> array:
+        """Returns the index of the period of every quarter-hour in the series.
+
+        The periods only depend on the time span, which is the same for every version of the market data, so they are
+        cached.
+        """
+        return _period_indices(self, series.start, len(series))
+
+
+@lru_cache(maxsize=16)
+def _period_indices(table: PeriodTable, start: datetime, length: int) -> array:
+    return array('B', (table.period_of((start + i * QUARTER_HOUR).astimezone(table.tz)) for i in range(length)))
+
+
+def _single(_: datetime) -> int:
+    return 0
+
+
+def _pt_bi_daily(local: datetime) -> int:
+    # fora de vazio, vazio
+    return 1 if local.hour < 8 or local.hour >= 22 else 0
+
+
+_PT_PONTA_SUMMER = ((time(10, 30), time(13, 0)), (time(19, 30), time(21, 0)))
+_PT_PONTA_WINTER = ((time(9, 0), time(10, 30)), (time(18, 0), time(20, 30)))
+
+
+def _pt_tri_daily(local: datetime) -> int:
+    # ponta, cheias, vazio. the ponta hours move with legal time (summer/winter)
+    t = local.time()
+    if t < time(8) or t >= time(22):
+        return 2
+
+    ponta = _PT_PONTA_SUMMER if local.dst() else _PT_PONTA_WINTER
+    return 0 if any(start <= t < end for start, end in ponta) else 1
+
+
+def _es_2_0td(local: datetime) -> int:
+    # P1 punta, P2 llano, P3 valle. national holidays are not taken into account and are charged as working days
+    if local.weekday() >= 5 or local.hour < 8:
+        return 2
+    return 0 if 10 <= local.hour < 14 or 18 <= local.hour < 22 else 1
+
+
+PERIOD_TABLES: dict[str, PeriodTable] = {t.key: t for t in (
+    PeriodTable("pt_simple", "pt_spot_price", TZ_LISBON, ("simples",), _single),
+    PeriodTable("pt_bi_daily", "pt_spot_price", TZ_LISBON, ("fora_de_vazio", "vazio"), _pt_bi_daily),
+    PeriodTable("pt_tri_daily", "pt_spot_price", TZ_LISBON, ("ponta", "cheias", "vazio"), _pt_tri_daily),
+    PeriodTable("es_simple", "es_spot_price", TZ_MADRID, ("single",), _single),
+    PeriodTable("es_2_0td", "es_spot_price", TZ_MADRID, ("P1", "P2", "P3"), _es_2_0td),
+)}
+"""The supported time-of-use period tables, by key. The daily cycles are used in Portugal."""
+
+
+class Tariff(NamedTuple):
+    """A retail price formula, applied to every quarter-hour's spot price in €/MWh:
+
+    `(spot * multiplier + adder + access[period]) * (1 + vat)`
+
+    Losses go in the multiplier, and fees that are subject to losses can be multiplied into the adder.
+    """
+    table: str
+    """Key of the period table."""
+
+    multiplier: float
+    """Factor applied to the spot price, e.g. 1.15 for 15% losses."""
+
+    adder: float
+    """Fees added to the spot price (€/MWh)."""
+
+    access: tuple[float, ...]
+    """Access charge of each period in the table (€/MWh)."""
+
+    vat: float
+    """VAT rate as a fraction, e.g. 0.23."""
+
+    @property
+    def period_table(self) -> PeriodTable:
+        return PERIOD_TABLES[self.table]
+
+    def apply(self, series: QuarterHourSeries) -> QuarterHourSeries:
+        """Returns the retail price of every quarter-hour of the series, computed in a single pass. NaN stays NaN."""
+        periods = self.period_table.period_indices(series)
+        multiplier, adder, access, factor = self.multiplier, self.adder, self.access, 1 + self.vat
+        return QuarterHourSeries(series.start, array('d', [
+            round((value * multiplier + adder + access[period]) * factor, 2) for value, period in zip(series.values, periods)
+        ]))
+
+
+def tariff_from_options(options: Mapping[str, Any]) -> Tariff | None:
+    """Returns the tariff configured in the options, or None if there is none.
+
+    Raises ValueError if the access charges do not match the periods of the chosen table.
+    """
+    table = PERIOD_TABLES.get(options.get(CONF_TARIFF, TARIFF_NONE))
+    if table is None:
+        return None
+
+    access_text = (options.get(CONF_TARIFF_ACCESS) or "").strip()
+    access = tuple(float(a) for a in access_text.split(",")) if access_text else (0.0,) * len(table.periods)
+    if len(access) != len(table.periods):
+        raise ValueError(f"{table.key} needs {len(table.periods)} access charges ({', '.join(table.periods)})")
+
+    return Tariff(
+        table=table.key,
+        multiplier=float(options.get(CONF_TARIFF_MULTIPLIER, 1.0)),
+        adder=float(options.get(CONF_TARIFF_ADDER, 0.0)),
+        access=access,
+        vat=float(options.get(CONF_TARIFF_VAT, 0.0)) / 100,
+    )
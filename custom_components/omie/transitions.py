@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import logging
+from bisect import bisect_right
+from datetime import datetime, tzinfo, timedelta
+from typing import NamedTuple, Sequence, Mapping, Any, TYPE_CHECKING
+
+from homeassistant.const import EVENT_CORE_CONFIG_UPDATE
+from homeassistant.core import HomeAssistant, callback, CALLBACK_TYPE, HassJob, HassJobType
+from homeassistant.helpers import event
+from homeassistant.util import dt as dt_util, utcnow
+
+from .const import CONF_PRICE_THRESHOLDS, CONF_CHEAPEST_SHARE, DEFAULT_CHEAPEST_SHARE, EVENT_PRICE_TRANSITION
+from .series import QuarterHourSeries, QUARTER_HOUR, local_midnight
+from .stats import Stats
+
+if TYPE_CHECKING:
+    from .view import OMIEMarketView
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PriceCondition(NamedTuple):
+    """Something that the price of a quarter-hour either is or is not."""
+    key: str
+    """Identifies the condition in entity ids and events, e.g. `below_50` or `cheapest_25`."""
+
+    threshold: float | None = None
+    """The condition holds while the price is below this (€/MWh)."""
+
+    cheapest_share: int | None = None
+    """The condition holds in this percentage of each local day's quarter-hours, the cheapest ones."""
+
+
+class Transition(NamedTuple):
+    """The start of a quarter-hour in which a condition on a series changes."""
+    at: datetime
+    """Start of the quarter-hour (UTC)."""
+
+    series: str
+    """The series whose prices the condition is on."""
+
+    condition: PriceCondition
+
+    active: bool | None
+    """Whether the condition holds from this quarter-hour on. None where the prices are not known."""
+
+    price: float | None
+    """The price in the quarter-hour, if known."""
+
+
+class PriceTransitions(NamedTuple):
+    """Every change of every condition on a series, in chronological order, computed once per version of the data."""
+    transitions: tuple[Transition, ...]
+
+    def state(self, condition: PriceCondition, instant: datetime) -> bool | None:
+        """Returns whether the condition holds at the instant, or None if that is not known."""
+        past = self.transitions[:bisect_right(self.transitions, instant, key=_at)]
+        return next((t.active for t in reversed(past) if t.condition == condition), None)
+
+    def next_change(self, condition: PriceCondition, instant: datetime) -> datetime | None:
+        """Returns when the condition next changes after the instant, or None if it does not change in the known prices."""
+        return next((t.at for t in self.transitions[bisect_right(self.transitions, instant, key=_at):] if t.condition == condition),
+                    None)
+
+
+def price_transitions(series: str, prices: QuarterHourSeries, conditions: Sequence[PriceCondition],
+                      local_tz: tzinfo) -> PriceTransitions:
+    """Returns the instants at which each condition changes over the prices, in one pass per condition.
+
+    The cheapest share of a day is only known for the local days (in `local_tz`) whose prices are all known.
+    """
+    values = prices.values
+    transitions = []
+    for condition in conditions:
+        if condition.threshold is not None:
+            threshold = condition.threshold
+            states = [None if v != v else v < threshold for v in values]
+        else:
+            states = _cheapest(prices, condition.cheapest_share, local_tz)
+
+        previous = None
+        for i, state in enumerate(states):
+            if state != previous:
+                transitions.append(Transition(prices.start + i * QUARTER_HOUR, series, condition, state,
+                                              None if values[i] != values[i] else values[i]))
+                previous = state
+        if previous is not None:
+            transitions.append(Transition(prices.end, series, condition, None, None))
+
+    return PriceTransitions(tuple(sorted(transitions, key=_at)))
+
+
+def _cheapest(prices: QuarterHourSeries, share: int, local_tz: tzinfo) -> list[bool | None]:
+    values = prices.values
+    states: list[bool | None] = [None] * len(values)
+    day = prices.start.astimezone(local_tz).date()
+    while (start := local_midnight(day, local_tz)) < prices.end:
+        end = local_midnight(day + timedelta(days=1), local_tz)
+        first, last = (start - prices.start) // QUARTER_HOUR, (end - prices.start) // QUARTER_HOUR
+        if first >= 0 and last <= len(values) and all(v == v for v in values[first:last]):
+            # ties go to the earlier quarter-hour
+            count = round((last - first) * share / 100)
+            cheapest = set(sorted(range(first, last), key=lambda i: values[i])[:count])
+            states[first:last] = [i in cheapest for i in range(first, last)]
+        day += timedelta(days=1)
+
+    return states
+
+
+def conditions_from_options(options: Mapping[str, Any]) -> tuple[PriceCondition, ...]:
+    """Returns the conditions configured in the options, which may be none.
+
+    Raises ValueError if the thresholds are not comma-separated numbers.
+    """
+    thresholds_text = (options.get(CONF_PRICE_THRESHOLDS) or "").strip()
+    thresholds = sorted({float(t) for t in thresholds_text.split(",")}) if thresholds_text else []
+    share = int(options.get(CONF_CHEAPEST_SHARE, DEFAULT_CHEAPEST_SHARE))
+
+    return tuple(
+        [PriceCondition(key=f"below_{t:g}".replace(".", "_").replace("-", "minus_"), threshold=t) for t in thresholds] +
+        ([PriceCondition(key=f"cheapest_{share}", cheapest_share=share)] if share > 0 else [])
+    )
+
+
+class OMIETransitionTracker:
+    """Keeps track of when the conditions on some series change, with a single timer set for the next change.
+
+    The changes are computed once for every version of the market data. At each of them an event is fired and the binary
+    sensors are updated, so nothing needs to be evaluated in the quarter-hours in which nothing changes.
+    """
+
+    def __init__(self, hass: HomeAssistant, view: OMIEMarketView, series: Sequence[str],
+                 conditions: Sequence[PriceCondition], entry_id: str) -> None:
+        self.hass = hass
+        self.view = view
+        self.series = tuple(series)
+        self.conditions = tuple(conditions)
+        self.stats = Stats()
+        self._entry_id = entry_id
+        self._local_tz: tzinfo | None = None
+        self._transitions: dict[str, PriceTransitions] = {}
+        self._timeline: list[Transition] = []
+        self._next = 0
+        self._listeners: list[CALLBACK_TYPE] = []
+        self._unsub_timer: CALLBACK_TYPE | None = None
+        self._job = HassJob(self._handle_transition, f"{view.coordinator.name} price transitions",
+                            job_type=HassJobType.Callback)
+
+    @callback
+    def async_setup(self) -> CALLBACK_TYPE:
+        """Starts following the market data. Returns a callback that stops it."""
+        self._local_tz = dt_util.get_default_time_zone()
+
+        @callback
+        def handle_core_config_update(e) -> None:
+            if 'time_zone' in e.data:
+                # the local days, and so the cheapest share of each, have moved
+                self._local_tz = dt_util.get_default_time_zone()
+                self._update()
+
+        unsubs = [
+            self.view.coordinator.async_add_listener(self._update),
+            self.hass.bus.async_listen(EVENT_CORE_CONFIG_UPDATE, handle_core_config_update),
+        ]
+        self._update()
+
+        @callback
+        def stop() -> None:
+            for unsub in unsubs:
+                unsub()
+            self._unschedule()
+
+        return stop
+
+    @callback
+    def async_add_listener(self, update: CALLBACK_TYPE) -> CALLBACK_TYPE:
+        """Calls `update` whenever a condition may have changed. Returns a callback that removes it."""
+        self._listeners.append(update)
+        return lambda: self._listeners.remove(update)
+
+    def state(self, series: str, condition: PriceCondition) -> bool | None:
+        """Returns whether the condition on the series holds now, or None if that is not known."""
+        transitions = self._transitions.get(series)
+        return transitions.state(condition, utcnow()) if transitions is not None else None
+
+    def next_change(self, series: str, condition: PriceCondition) -> datetime | None:
+        """Returns when the condition on the series next changes, or None if that is not known."""
+        transitions = self._transitions.get(series)
+        return transitions.next_change(condition, utcnow()) if transitions is not None else None
+
+    def diagnostics(self) -> dict[str, Any]:
+        return {
+            "conditions": [c.key for c in self.conditions],
+            "transitions": len(self._timeline),
+            "next_transition": self._timeline[self._next].at.isoformat() if self._next < len(self._timeline) else None,
+            "stats": self.stats.as_dict(),
+        }
+
+    @callback
+    def _update(self) -> None:
+        """Picks up the changes in a new version of the market data, and sets the timer for the first one from now."""
+        now = utcnow()
+        self._transitions = {}
+        for series in self.series:
+            if (transitions := self.view.transitions(series, self._local_tz, self.conditions)) is not None:
+                self._transitions[series] = transitions
+
+        self._timeline = sorted((t for ts in self._transitions.values() for t in ts.transitions), key=_at)
+        self._next = bisect_right(self._timeline, now, key=_at)
+        _LOGGER.debug("%s: %d price transitions from now", self.view.coordinator.name, len(self._timeline) - self._next)
+        self._notify()
+        self._schedule()
+
+    @callback
+    def _handle_transition(self, now: datetime) -> None:
+        self._unsub_timer = None
+        self.stats.count("timer_runs")
+        due = []
+        while self._next < len(self._timeline) and self._timeline[self._next].at <= now:
+            due.append(self._timeline[self._next])
+            self._next += 1
+
+        self._notify()
+        for t in due:
+            if t.active is not None:
+                self.stats.count("events")
+                self.hass.bus.async_fire(EVENT_PRICE_TRANSITION, {
+                    "config_entry_id": self._entry_id,
+                    "series": t.series,
+                    "condition": t.condition.key,
+                    "active": t.active,
+                    "price": t.price,
+                    "start": t.at.isoformat(),
+                })
+
+        self._schedule()
+
+    @callback
+    def _notify(self) -> None:
+        for update in list(self._listeners):
+            update()
+
+    @callback
+    def _schedule(self) -> None:
+        self._unschedule()
+        if self._next < len(self._timeline):
+            self._unsub_timer = event.async_track_point_in_utc_time(self.hass, self._job, self._timeline[self._next].at)
+
+    @callback
+    def _unschedule(self) -> None:
+        if self._unsub_timer is not None:
+            self._unsub_timer()
+            self._unsub_timer = None
+
+
+def _at(transition: Transition) -> datetime:
+    return transition.at
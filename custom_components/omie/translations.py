@@ -31,6 +31,15 @@ class EntityNames(NamedTuple):
     spot_price_pt: str
     spot_price_es_tomorrow: str
     spot_price_pt_tomorrow: str
+    spot_price_es_cheapest_window: str
+    spot_price_pt_cheapest_window: str
+    spot_price_es_below: str
+    spot_price_pt_below: str
+    spot_price_es_cheapest: str
+    spot_price_pt_cheapest: str
+    spot_fetch_duration: str
+    spot_update_duration: str
+    tariff_price: str
 
 
 class DeviceNames(NamedTuple):
@@ -46,18 +55,45 @@ ENTITY_NAMES: Translated[EntityNames] = Translated(
         spot_price_pt="Marginal price - Portugal",
         spot_price_es_tomorrow="Marginal price tomorrow - Spain",
         spot_price_pt_tomorrow="Marginal price tomorrow - Portugal",
+        spot_price_es_cheapest_window="Cheapest window start - Spain",
+        spot_price_pt_cheapest_window="Cheapest window start - Portugal",
+        spot_price_es_below="Marginal price below {threshold} €/MWh - Spain",
+        spot_price_pt_below="Marginal price below {threshold} €/MWh - Portugal",
+        spot_price_es_cheapest="Cheapest {share}% of the day - Spain",
+        spot_price_pt_cheapest="Cheapest {share}% of the day - Portugal",
+        spot_fetch_duration="Marginal price fetch duration",
+        spot_update_duration="Marginal price update duration",
+        tariff_price="Tariff price",
     ),
     es=EntityNames(
         spot_price_es="Precio marginal - España",
         spot_price_pt="Precio marginal - Portugal",
         spot_price_es_tomorrow="Precio marginal mañana - España",
         spot_price_pt_tomorrow="Precio marginal mañana - Portugal",
+        spot_price_es_cheapest_window="Inicio del periodo más barato - España",
+        spot_price_pt_cheapest_window="Inicio del periodo más barato - Portugal",
+        spot_price_es_below="Precio marginal por debajo de {threshold} €/MWh - España",
+        spot_price_pt_below="Precio marginal por debajo de {threshold} €/MWh - Portugal",
+        spot_price_es_cheapest="{share}% más barato del día - España",
+        spot_price_pt_cheapest="{share}% más barato del día - Portugal",
+        spot_fetch_duration="Duración de la descarga del precio marginal",
+        spot_update_duration="Duración de la actualización del precio marginal",
+        tariff_price="Precio de la tarifa",
     ),
     pt=EntityNames(
         spot_price_es="Preço marginal - Espanha",
         spot_price_pt="Preço marginal - Portugal",
         spot_price_es_tomorrow="Preço marginal amanhã - Espanha",
         spot_price_pt_tomorrow="Preço marginal amanhã - Portugal",
+        spot_price_es_cheapest_window="Início do período mais barato - Espanha",
+        spot_price_pt_cheapest_window="Início do período mais barato - Portugal",
+        spot_price_es_below="Preço marginal abaixo de {threshold} €/MWh - Espanha",
+        spot_price_pt_below="Preço marginal abaixo de {threshold} €/MWh - Portugal",
+        spot_price_es_cheapest="{share}% mais barato do dia - Espanha",
+        spot_price_pt_cheapest="{share}% mais barato do dia - Portugal",
+        spot_fetch_duration="Duração da obtenção do preço marginal",
+        spot_update_duration="Duração da atualização do preço marginal",
+        tariff_price="Preço do tarifário",
     ),
 )
 
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta, tzinfo, date
+from typing import NamedTuple, Hashable, Callable, Any
+
+from homeassistant.core import HomeAssistant, callback, CALLBACK_TYPE
+from pyomie.model import OMIEResults, SpotData
+
+from .const import CET, RESOLUTION_QUARTER_HOURLY, RESOLUTION_HOURLY
+from .coordinator import OMIEMarketCoordinator
+from .forecast import OMIEForecaster, FORECAST_DAYS
+from .stats import Stats
+from .tariff import Tariff
+from .transitions import PriceCondition, PriceTransitions, price_transitions
+from .series import QuarterHourSeries, local_midnight, floor_quarter_hour
+from .windows import PriceWindow, PriceQuarterHours, cheapest_window, cheapest_quarter_hours
+
+_LOGGER = logging.getLogger(__name__)
+
+_ResultsKey = tuple[date, datetime] | None
+"""Identifies one version of the results for a market date: (market_date, updated_at)."""
+
+_DataVersion = tuple[_ResultsKey, _ResultsKey, _ResultsKey]
+"""Identifies one version of the coordinator's data: the results for yesterday, today and tomorrow."""
+
+_CET = "cet"
+"""Marks the cached CET series of one market date, which outlive versions of the data that still hold that date."""
+
+
+class LocalizedDay(NamedTuple):
+    """A local day's worth of quarter-hourly prices."""
+    series: QuarterHourSeries
+    """Every quarter-hour in the local day, NaN where the price is not yet known."""
+
+    quarter_hours: dict[datetime, float | None] | None
+    """Every quarter-hour in the local day, mapped to its price (or None if not yet known). None if not wanted."""
+
+    hours: dict[datetime, float | None] | None
+    """Every hour in the local day, mapped to its average price (or None if not yet known). None if not wanted."""
+
+    average: float | None
+    """Arithmetic mean of the known prices."""
+
+    min: float | None
+    """Lowest known price."""
+
+    max: float | None
+    """Highest known price."""
+
+    provisional: bool
+    """Whether any of the day's prices are not yet known."""
+
+    @staticmethod
+    def of(series: QuarterHourSeries, tz: tzinfo, resolution: str = RESOLUTION_QUARTER_HOURLY) -> LocalizedDay:
+        return LocalizedDay(
+            series=series,
+            quarter_hours=series.as_dict(tz) if resolution != RESOLUTION_HOURLY else None,
+            hours=series.as_hourly_dict(tz) if resolution != RESOLUTION_QUARTER_HOURLY else None,
+            average=series.average(),
+            min=series.min(),
+            max=series.max(),
+            provisional=not series.complete(),
+        )
+
+
+class LocalizedPrices(NamedTuple):
+    """One OMIE series localized to a time zone, as seen on a given local date."""
+    today: LocalizedDay
+    """Today's prices in the local time zone."""
+
+    tomorrow: LocalizedDay
+    """Tomorrow's prices in the local time zone."""
+
+    omie_today_average: float | None
+    """Average price for today's market date (CET)."""
+
+    omie_tomorrow_average: float | None
+    """Average price for tomorrow's market date (CET)."""
+
+    forecast: LocalizedDay | None = None
+    """Estimated prices from the end of the published ones until the end of the day after tomorrow in the local time
+    zone, if forecasting is enabled. Never overlaps the published prices."""
+
+
+class OMIEMarketView:
+    """Memoized localized view of the market results held by an `OMIEMarketCoordinator`.
+
+    Entities that read the same series in the same time zone share the structures computed here, which are
+    only rebuilt when the underlying coordinator data changes. The views of every source can share one cache, as its
+    keys start with the coordinator's name. The view does not listen to the coordinator, so it does not cause the
+    coordinator to be refreshed: stale entries are dropped the first time the view is read after the data changes.
+    """
+
+    def __init__(self, hass: HomeAssistant, coordinator: OMIEMarketCoordinator,
+                 cache: dict[Hashable, Any] | None = None, forecaster: OMIEForecaster | None = None) -> None:
+        self.hass = hass
+        self.coordinator = coordinator
+        self.forecaster = forecaster
+        self._cache: dict[Hashable, Any] = cache if cache is not None else {}
+        self._version: _DataVersion | None = None
+        self.stats = Stats()
+
+    @callback
+    def async_setup(self) -> CALLBACK_TYPE:
+        """Returns a callback that drops this view's cached entries."""
+
+        @callback
+        def clear() -> None:
+            for k in [k for k in self._cache if k[0] == self.coordinator.name]:
+                del self._cache[k]
+
+        return clear
+
+    def memoize(self, key: tuple[Hashable, ...], compute: Callable[[], Any]) -> Any:
+        """Returns the result of `compute()`, which is only called once per version of the coordinator's data.
+
+        The first item of `key` names what is being computed, which is also used to time it. Returns None without calling
+        `compute()` if there is not enough data yet.
+        """
+        version = self._data_version()
+        if version is None:
+            # not all necessary data available yet
+            return None
+
+        if version != self._version:
+            self._prune(version)
+
+        versioned_key = (self.coordinator.name, version, key)
+        if versioned_key in self._cache:
+            self.stats.count("cache_hits")
+        else:
+            self.stats.count("cache_misses")
+            with self.stats.timed(f"{key[0]}_ms"):
+                self._cache[versioned_key] = compute()
+
+        return self._cache[versioned_key]
+
+    def series(self, series: str) -> QuarterHourSeries | None:
+        """Returns the given series across yesterday, today and tomorrow (CET), or None if there is not enough data yet."""
+
+        def cet_window() -> QuarterHourSeries:
+            window = self.coordinator.data
+            return QuarterHourSeries.span(
+                local_midnight(window.yesterday.market_date, CET),
+                local_midnight(window.today.market_date + timedelta(days=2), CET),
+                [self._cet_series(results, series) for results in [window.yesterday, window.today, window.tomorrow]])
+
+        return self.memoize(('series', series), cet_window)
+
+    def tariffed(self, series: str, tariff: Tariff) -> QuarterHourSeries | None:
+        """Returns the retail prices of `tariff` for the given series across yesterday, today and tomorrow (CET)."""
+        return self.memoize(('tariffed', series, tariff), lambda: tariff.apply(self.series(series)))
+
+    def localized(self, series: str, local_tz: tzinfo, local_today: date, tariff: Tariff | None = None,
+                  resolution: str = RESOLUTION_QUARTER_HOURLY) -> LocalizedPrices | None:
+        """Returns the given series localized to `local_tz`, or None if there is not enough data yet.
+
+        If a tariff is given then the prices are its retail prices instead of the market's. The resolution decides whether
+        the quarter-hourly prices, the hourly averages or both are mapped to their local start times.
+        """
+
+        forecast_version = self._forecast_version()
+
+        def localize() -> LocalizedPrices:
+            window = self.coordinator.data
+            cet_window = self.series(series) if tariff is None else self.tariffed(series, tariff)
+            forecast = self.forecast(series, tariff)
+            cet_today = cet_window.local_day(window.market_date, CET)
+            cet_tomorrow = cet_window.local_day(window.market_date + timedelta(days=1), CET)
+
+            _LOGGER.debug("%s: computing localized view (series=%s, tz=%s, local_today=%s, tariff=%s)",
+                          self.coordinator.name, series, local_tz, local_today, tariff)
+            return LocalizedPrices(
+                today=LocalizedDay.of(cet_window.local_day(local_today, local_tz), local_tz, resolution),
+                tomorrow=LocalizedDay.of(cet_window.local_day(local_today + timedelta(days=1), local_tz), local_tz, resolution),
+                omie_today_average=cet_today.average(),
+                omie_tomorrow_average=cet_tomorrow.average(),
+                forecast=LocalizedDay.of(forecast.slice(forecast.start, local_midnight(local_today + timedelta(days=3), local_tz)),
+                                         local_tz, resolution) if forecast is not None else None,
+            )
+
+        return self.memoize(('localized', series, str(local_tz), local_today, tariff, resolution, forecast_version), localize)
+
+    def forecast(self, series: str, tariff: Tariff | None = None) -> QuarterHourSeries | None:
+        """Returns the forecast of the given series (or of a tariff's prices) from the end of its published values until
+        the end of the last forecast market date (CET). None if forecasting is disabled or has nothing to go on yet.
+        """
+        forecast_version = self._forecast_version()
+        if forecast_version is None:
+            return None
+
+        def compute() -> QuarterHourSeries | None:
+            window = self.coordinator.data
+            days = [self.forecaster.predict(series, window.market_date + timedelta(days=n)) for n in range(1, FORECAST_DAYS + 1)]
+            if days[0] is None:
+                return None
+
+            end = local_midnight(window.market_date + timedelta(days=FORECAST_DAYS + 1), CET)
+            forecast = QuarterHourSeries.span(self.series(series).known_end(), end, days)
+            return forecast if tariff is None else tariff.apply(forecast)
+
+        return self.memoize(('forecast', series, tariff, forecast_version), compute)
+
+    def cheapest_window(self, series: str, start: datetime, end: datetime | None, duration: timedelta,
+                        most_expensive: bool = False) -> PriceWindow | None:
+        """Returns the cheapest (or most expensive) contiguous window of `duration` in `[start, end)`.
+
+        `start` is rounded down to the start of its quarter-hour and a missing `end` means the end of the known prices. The
+        search is not memoized, as `start` moves on with every call.
+        """
+        prices = self.series(series)
+        if prices is None:
+            return None
+
+        with self.stats.timed("cheapest_window_ms"):
+            return cheapest_window(prices, floor_quarter_hour(start), end or prices.end, duration, most_expensive)
+
+    def cheapest_quarter_hours(self, series: str, start: datetime, end: datetime | None, count: int,
+                               most_expensive: bool = False) -> PriceQuarterHours | None:
+        """Returns the `count` cheapest (or most expensive) quarter-hours in `[start, end)`, not necessarily contiguous.
+
+        `start` is rounded down to the start of its quarter-hour and a missing `end` means the end of the known prices. The
+        search is not memoized, as `start` moves on with every call.
+        """
+        prices = self.series(series)
+        if prices is None:
+            return None
+
+        with self.stats.timed("cheapest_quarter_hours_ms"):
+            return cheapest_quarter_hours(prices, floor_quarter_hour(start), end or prices.end, count, most_expensive)
+
+    def transitions(self, series: str, local_tz: tzinfo, conditions: tuple[PriceCondition, ...]) -> PriceTransitions | None:
+        """Returns when each of the conditions on the given series changes, or None if there is not enough data yet.
+
+        The cheapest share of a day is that of the local days in `local_tz`.
+        """
+        return self.memoize(
+            ('transitions', series, str(local_tz), conditions),
+            lambda: price_transitions(series, self.series(series), conditions, local_tz))
+
+    def _forecast_version(self) -> int | None:
+        """Brings the forecast models up to date with the coordinator's data and returns their version."""
+        if self.forecaster is None:
+            return None
+
+        self.forecaster.learn(self.coordinator.data)
+        return self.forecaster.version
+
+    def _data_version(self) -> _DataVersion | None:
+        window = self.coordinator.data
+        if window is None or window.today is None or window.yesterday is None:
+            return None
+
+        return _results_key(window.yesterday), _results_key(window.today), _results_key(window.tomorrow)
+
+    def _cet_series(self, results: OMIEResults[SpotData] | None, series: str) -> QuarterHourSeries | None:
+        if results is None:
+            return None
+
+        key = (self.coordinator.name, _CET, series, _results_key(results))
+        cached = self._cache.get(key)
+        if cached is None:
+            cached = self._cache[key] = QuarterHourSeries.market_day(results.market_date, getattr(results.contents, series))
+
+        return cached
+
+    def _prune(self, version: _DataVersion) -> None:
+        """Drops this view's cached entries that were built from results no longer held by the coordinator."""
+        window = self.coordinator.data
+        live = {_results_key(r) for r in (window.results.values() if window is not None else [])}
+        stale = [k for k in self._cache if k[0] == self.coordinator.name and (
+            k[3] not in live if k[1] == _CET else k[1] != version)]
+        for k in stale:
+            del self._cache[k]
+        self._version = version
+
+
+def _results_key(results: OMIEResults | None) -> _ResultsKey:
+    return None if results is None else (results.market_date, results.updated_at)
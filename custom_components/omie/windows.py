@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import heapq
+import math
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from .series import QuarterHourSeries, QUARTER_HOUR
+
+
+class PriceWindow(NamedTuple):
+    """A contiguous run of quarter-hours."""
+    start: datetime
+    """Start of the first quarter-hour (UTC)."""
+
+    end: datetime
+    """End of the last quarter-hour (UTC)."""
+
+    average: float
+    """Average price over the window."""
+
+
+class PriceQuarterHours(NamedTuple):
+    """A set of quarter-hours that need not be contiguous."""
+    quarter_hours: list[tuple[datetime, float]]
+    """The start of each quarter-hour (UTC) and its price, in chronological order."""
+
+    average: float
+    """Average price over the quarter-hours."""
+
+
+def cheapest_window(series: QuarterHourSeries,
+                    start: datetime,
+                    end: datetime,
+                    duration: timedelta,
+                    most_expensive: bool = False) -> PriceWindow | None:
+    """Finds the contiguous window of `duration` within `[start, end)` with the lowest (or highest) average price.
+
+    Uses a running sum so that every candidate window is evaluated in constant time. Windows that contain a missing
+    price are skipped. Returns None if there is no such window.
+    """
+    span = series.slice(start, end)
+    values = span.values
+    length = _quarter_hours(duration)
+    if length <= 0 or length > len(values):
+        return None
+
+    sign = -1 if most_expensive else 1
+    window_sum = 0.0
+    missing = 0
+    best_sum, best_start = math.inf, None
+    for i, value in enumerate(values):
+        if value != value:
+            missing += 1
+        else:
+            window_sum += value
+
+        if i >= length:
+            leaving = values[i - length]
+            if leaving != leaving:
+                missing -= 1
+            else:
+                window_sum -= leaving
+
+        if i >= length - 1 and missing == 0 and sign * window_sum < best_sum:
+            best_sum, best_start = sign * window_sum, i - length + 1
+
+    if best_start is None:
+        return None
+
+    window_start = span.start + best_start * QUARTER_HOUR
+    # recompute the sum exactly rather than relying on the running one
+    average = math.fsum(values[best_start:best_start + length]) / length
+    return PriceWindow(start=window_start, end=window_start + length * QUARTER_HOUR, average=round(average, 2))
+
+
+def cheapest_quarter_hours(series: QuarterHourSeries,
+                           start: datetime,
+                           end: datetime,
+                           count: int,
+                           most_expensive: bool = False) -> PriceQuarterHours | None:
+    """Finds the `count` quarter-hours within `[start, end)` with the lowest (or highest) prices.
+
+    Uses a bounded heap, so it runs in O(n log count). Missing prices are never selected. Returns None if there are fewer
+    than `count` known prices.
+    """
+    span = series.slice(start, end)
+    known = ((i, v) for i, v in enumerate(span.values) if v == v)
+    select = heapq.nlargest if most_expensive else heapq.nsmallest
+    selected = select(count, known, key=lambda iv: iv[1]) if count > 0 else []
+    if len(selected) < count or count == 0:
+        return None
+
+    selected.sort()
+    return PriceQuarterHours(
+        quarter_hours=[(span.start + i * QUARTER_HOUR, v) for i, v in selected],
+        average=round(math.fsum(v for _, v in selected) / count, 2),
+    )
+
+
+def _quarter_hours(duration: timedelta) -> int:
+    """Number of whole quarter-hours needed to cover `duration`."""
+    return math.ceil(duration / QUARTER_HOUR)
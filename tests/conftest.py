@@ -0,0 +1,55 @@
+"""Fixtures shared by the tests."""
+from __future__ import annotations
+
+from datetime import date, datetime, time
+from typing import Callable, Any, Awaitable
+from unittest.mock import patch
+
+import pytest
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.omie.const import DOMAIN, CET
+from custom_components.omie.fetch import Fetched, Validators
+
+from .fake_omie import FakeOMIE, SimulatedClock
+from .market_data import spot_results
+
+
+@pytest.fixture
+def setup_omie(hass: HomeAssistant, enable_custom_integrations) -> Callable[..., Awaitable[MockConfigEntry]]:
+    """Returns a function that sets up a config entry whose market files come from `market_data` (or from the given
+    `fetch_market_file`), off the network."""
+
+    async def fetch_market_file(client_session, url, market_date: date, parse, validators: Validators | None) -> Fetched:
+        fetched = Validators(etag=market_date.isoformat())
+        return Fetched(None if validators == fetched else spot_results(market_date), fetched)
+
+    async def setup(options: dict[str, Any] | None = None, fetch: Callable[..., Awaitable[Fetched]] = fetch_market_file) \
+            -> MockConfigEntry:
+        entry = MockConfigEntry(domain=DOMAIN, data={}, options=options or {})
+        entry.add_to_hass(hass)
+        # nothing goes over the network, and a real client session leaves its resolver's thread behind
+        with patch("custom_components.omie.coordinator.fetch_market_file", fetch), \
+                patch("custom_components.omie.coordinator.async_get_clientsession"):
+            assert await hass.config_entries.async_setup(entry.entry_id)
+            await hass.async_block_till_done(wait_background_tasks=True)
+        return entry
+
+    return setup
+
+
+@pytest.fixture
+async def fake_omie(socket_enabled) -> Callable[..., Awaitable[FakeOMIE]]:
+    """Returns a function that starts a fake OMIE server whose clock reads five past midnight (CET) on the given date."""
+    servers = []
+
+    async def start(start_date: date, **kwargs) -> FakeOMIE:
+        server = FakeOMIE(SimulatedClock(CET.localize(datetime.combine(start_date, time(0, 5)))), **kwargs)
+        await server.start()
+        servers.append(server)
+        return server
+
+    yield start
+    for s in servers:
+        await s.close()
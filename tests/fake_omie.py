@@ -0,0 +1,193 @@
+"""A stand-in for the OMIE web server that publishes market files according to the session schedule."""
+from __future__ import annotations
+
+import asyncio
+import random
+import re
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from typing import NamedTuple, Sequence
+
+from aiohttp import web, hdrs
+from aiohttp.test_utils import TestServer
+from pyomie.model import SpotData
+
+from custom_components.omie.const import CET
+from custom_components.omie.schedule import MarketSession, DAY_AHEAD, publications
+
+from .market_data import spot_results
+
+_SPOT_FILE = re.compile(r"^/sites/default/files/dados/AGNO_(\d{4})/MES_(\d{2})/TXT/INT_PBC_EV_H_1_(\d{2})_\2_\1_\3_\2_\1\.TXT$")
+
+_SPOT_LABELS = {
+    "es_pt_total_power": "Potencia total con bilaterales del mercado Ibérico (MW)",
+    "es_purchases_power": "Potencia total de compra sistema español (MW)",
+    "pt_purchases_power": "Potencia total de compra sistema portugués (MW)",
+    "es_sales_power": "Potencia total de venta sistema español (MW)",
+    "pt_sales_power": "Potencia total de venta sistema portugués (MW)",
+    "es_pt_power": "Potencia total del mercado Ibérico (MW)",
+    "es_to_pt_exports_power": "Exportación de España a Portugal (MW)",
+    "es_from_pt_imports_power": "Importación de España desde Portugal (MW)",
+    "es_spot_price": "Precio marginal en el sistema español (EUR/MWh)",
+    "pt_spot_price": "Precio marginal en el sistema portugués (EUR/MWh)",
+}
+"""How each `SpotData` series is labelled in the file."""
+
+
+class SimulatedClock:
+    """The current time as seen by the coordinator and the fake server. Only moves when told to."""
+
+    def __init__(self, now: datetime) -> None:
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+class ServedRequest(NamedTuple):
+    """A request that the fake server responded to."""
+    at: datetime
+    """Simulated time at which the request arrived (UTC)."""
+
+    market_date: date | None
+    """The market date of the requested file, or None if it was not a market file."""
+
+    status: int
+    """HTTP status of the response."""
+
+
+class Published(NamedTuple):
+    """A version of a market file."""
+    market_date: date
+    """Market date that the file is for."""
+
+    version: int
+    """1 for the first version of the file, incremented each time that it changes."""
+
+    at: datetime
+    """Simulated time at which the version became available (UTC)."""
+
+
+class FakeOMIE:
+    """Serves spot market files, each of which only appears once the session that produces it has been published.
+
+    Every session in `sessions` publishes a new version of the files whose market dates it changes, which is made
+    available at the session's publication time plus a random lag within `publication_lag`. Files are synthetic unless
+    a file with the same name as the one requested is found in `recorded`, in which case that is served as is.
+    """
+
+    def __init__(self,
+                 clock: SimulatedClock,
+                 sessions: Sequence[MarketSession] = (DAY_AHEAD,),
+                 publication_lag: tuple[timedelta, timedelta] = (timedelta(0), timedelta(0)),
+                 latency: timedelta = timedelta(0),
+                 failure_rate: float = 0.0,
+                 recorded: Path | None = None,
+                 seed: int = 0) -> None:
+        self.clock = clock
+        self.sessions = sessions
+        self.publication_lag = publication_lag
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.recorded = recorded
+        self.requests: list[ServedRequest] = []
+        self._seed = seed
+        self._failures = random.Random(seed)
+        self._published: dict[date, list[Published]] = {}
+        self._files: dict[Published, bytes] = {}
+        self._server: TestServer | None = None
+
+    @property
+    def base_url(self) -> str:
+        """The URL to use instead of `OMIE_BASE_URL`."""
+        return str(self._server.make_url("")).rstrip("/")
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self._handle)
+        self._server = TestServer(app)
+        await self._server.start_server()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            await self._server.close()
+
+    def published(self, market_date: date) -> list[Published]:
+        """Every version of the file for the market date, whether or not it is available yet."""
+        if market_date not in self._published:
+            rng = random.Random(f"{self._seed}:{market_date}")
+            lag_min, lag_max = (lag.total_seconds() for lag in self.publication_lag)
+            instants = sorted(p + timedelta(seconds=rng.uniform(lag_min, lag_max)) for p in publications(self.sessions, market_date))
+            self._published[market_date] = [Published(market_date, i + 1, at.astimezone(timezone.utc)) for i, at in enumerate(instants)]
+
+        return self._published[market_date]
+
+    def available(self, market_date: date) -> Published | None:
+        """The latest version of the file for the market date that is available now."""
+        return max((p for p in self.published(market_date) if p.at <= self.clock()), default=None)
+
+    def version_of(self, header: str) -> Published | None:
+        """Works out which version of a file has the given header line."""
+        return next((p for p in self._files if _header(p) == header), None)
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        match = _SPOT_FILE.match(request.path)
+        market_date = date(int(match[1]), int(match[2]), int(match[3])) if match else None
+        response = await self._respond(request, market_date)
+        self.requests.append(ServedRequest(at=self.clock(), market_date=market_date, status=response.status))
+        return response
+
+    async def _respond(self, request: web.Request, market_date: date | None) -> web.StreamResponse:
+        if self.latency:
+            await asyncio.sleep(self.latency.total_seconds())
+
+        if self._failures.random() < self.failure_rate:
+            return web.Response(status=503)
+
+        version = self.available(market_date) if market_date is not None else None
+        if version is None:
+            return web.Response(status=404)
+
+        etag = f'"{market_date.isoformat()}-{version.version}"'
+        if request.headers.get(hdrs.IF_NONE_MATCH) == etag:
+            return web.Response(status=304, headers={hdrs.ETAG: etag})
+
+        return web.Response(body=self._file(request.path, version), headers={
+            hdrs.ETAG: etag,
+            hdrs.LAST_MODIFIED: format_datetime(version.at, usegmt=True),
+            hdrs.CONTENT_TYPE: "text/plain; charset=iso-8859-1",
+        })
+
+    def _file(self, path: str, version: Published) -> bytes:
+        if version not in self._files:
+            recorded = self.recorded / Path(path).name if self.recorded is not None else None
+            self._files[version] = recorded.read_bytes() if recorded is not None and recorded.exists() \
+                else _spot_file(version).encode("iso-8859-1")
+
+        return self._files[version]
+
+
+def _spot_file(version: Published) -> str:
+    """Renders a spot market file in the same layout as OMIE's, nudging the prices in every version after the first."""
+    contents: SpotData = spot_results(version.market_date).contents
+    nudge = 0.01 * (version.version - 1)
+    columns = len(contents.es_spot_price)
+
+    lines = [
+        _header(version),
+        f"{version.market_date:%d/%m/%Y};",
+        ";".join(["Periodo", *(str(i + 1) for i in range(columns))]) + ";",
+    ]
+    for field, label in _SPOT_LABELS.items():
+        values = getattr(contents, field)
+        if field.endswith("_price"):
+            values = [v + nudge for v in values]
+        lines.append(";".join([label, *(f"{v:.2f}".replace(".", ",") for v in values)]) + ";")
+
+    return "\r\n".join(lines) + "\r\n"
+
+
+def _header(version: Published) -> str:
+    return f"OMIE - Mercado de electricidad;Fecha Emisión :{version.at.astimezone(CET):%d/%m/%Y - %H:%M:%S};" \
+           f"Versión {version.version};"
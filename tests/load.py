@@ -0,0 +1,154 @@
+"""Runs the real coordinator against the fake OMIE server under a simulated clock and measures what it does."""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import Counter
+from datetime import datetime, date, timedelta
+from typing import NamedTuple, Any
+from unittest.mock import patch
+
+from aiohttp import ClientSession, TCPConnector, ThreadedResolver
+from homeassistant.core import HomeAssistant
+from pyomie.model import SpotData, OMIEResults
+from pytest_homeassistant_custom_component.common import async_fire_time_changed_exact
+
+from custom_components.omie.const import CET
+from custom_components.omie.coordinator import OMIEMarketCoordinator, OMIEFetchScheduler, results_store, spot_price
+from custom_components.omie.fetch import Validators, OMIEFetchCache
+
+from .fake_omie import FakeOMIE, Published, ServedRequest
+
+_MAX_WAKE_UPS = 100_000
+"""Gives up on a run in which the coordinator keeps waking up without the clock moving on."""
+
+
+class LoadReport(NamedTuple):
+    """What the coordinator did during a run."""
+    requests: list[ServedRequest]
+    """Every request that reached the fake server."""
+
+    fetch_latencies: list[float]
+    """Wall-clock duration of every fetch, in seconds."""
+
+    fresh_after: dict[Published, timedelta | None]
+    """For every version of a file published during the run, how long it took the coordinator to hold it (None if it never did)."""
+
+    wake_ups: int
+    """Number of times that the coordinator's scheduled refresh ran."""
+
+    days: float
+    """Length of the run in days."""
+
+    held: dict[date, OMIEResults[SpotData]]
+    """The results that the coordinator held at the end of the run."""
+
+    @property
+    def requests_per_day(self) -> float:
+        return len(self.requests) / self.days
+
+    @property
+    def max_fresh_after(self) -> timedelta | None:
+        """Longest delay in holding a published version, or None if any version was never held."""
+        delays = list(self.fresh_after.values())
+        return None if None in delays else max(delays, default=timedelta(0))
+
+    def summary(self) -> dict[str, Any]:
+        latencies = sorted(self.fetch_latencies)
+        delays = sorted(d.total_seconds() for d in self.fresh_after.values() if d is not None)
+        return {
+            "requests": len(self.requests),
+            "requests_per_day": round(self.requests_per_day, 2),
+            "responses": dict(sorted(Counter(r.status for r in self.requests).items())),
+            "wake_ups": self.wake_ups,
+            "fetch_latency_p50_ms": round(_percentile(latencies, 0.5) * 1000, 2),
+            "fetch_latency_max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            "versions_published": len(self.fresh_after),
+            "versions_missed": sum(1 for d in self.fresh_after.values() if d is None),
+            "fresh_after_p50_s": round(_percentile(delays, 0.5), 1),
+            "fresh_after_max_s": round(delays[-1], 1) if delays else 0.0,
+        }
+
+
+async def run_coordinator(hass: HomeAssistant, server: FakeOMIE, until: datetime, entries: int = 1) -> LoadReport:
+    """Runs a spot coordinator from the server's current simulated time until `until`, jumping straight to each refresh
+    that the coordinator schedules.
+
+    Only the clock that the coordinator and the server see is simulated: requests go over HTTP to the fake server and the
+    coordinator's timers are fired by Home Assistant's event helpers, exactly as they are in production. With several
+    `entries` there is one coordinator per config entry, all sharing one scheduler, store and fetch cache as they do in
+    the integration, and the report is that of the first one.
+    """
+    clock = server.clock
+    started_at = clock()
+    latencies: list[float] = []
+    held: dict[date, Any] = {}
+    fresh_at: dict[Published, datetime] = {}
+
+    async def fetch(client_session, market_date: date, validators: Validators | None):
+        started = time.perf_counter()
+        try:
+            return await spot_price(client_session, market_date, validators, base_url=server.base_url)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    # the fake server needs no DNS, and the asynchronous resolver leaves a thread behind when it is closed
+    async with ClientSession(connector=TCPConnector(resolver=ThreadedResolver())) as client_session:
+        with patch("custom_components.omie.coordinator.utcnow", clock), \
+                patch("custom_components.omie.fetch.utcnow", clock), \
+                patch("custom_components.omie.coordinator.async_get_clientsession", return_value=client_session):
+            fetch_cache, store, scheduler = OMIEFetchCache(), results_store(hass, "load"), OMIEFetchScheduler(hass, "load")
+            coordinators = [
+                OMIEMarketCoordinator(hass, "load", market_fetcher=fetch, contents_type=SpotData, fetch_cache=fetch_cache,
+                                      market_date=lambda: clock().astimezone(CET).date(), sessions=server.sessions,
+                                      scheduler=scheduler, store=store)
+                for _ in range(entries)
+            ]
+            coordinator = coordinators[0]
+
+            def on_update() -> None:
+                results = coordinator.data.results if coordinator.data is not None else {}
+                for market_date, r in results.items():
+                    if held.get(market_date) is not r:
+                        held[market_date] = r
+                        version = server.version_of(r.contents.header) or server.available(market_date)
+                        fresh_at.setdefault(version, clock())
+
+            unsubs = [coordinator.async_add_listener(on_update)] + [c.async_add_listener(lambda: None) for c in coordinators[1:]]
+            await asyncio.gather(*[c.async_refresh() for c in coordinators])
+
+            wake_ups = 0
+            while (next_refresh := scheduler.next_refresh) is not None and next_refresh <= until:
+                wake_ups += 1
+                if wake_ups > _MAX_WAKE_UPS:
+                    raise RuntimeError(f"coordinator is stuck at {clock()} (next_refresh={next_refresh})")
+
+                clock.now = max(clock.now, next_refresh)
+                async_fire_time_changed_exact(hass, clock.now)
+                await hass.async_block_till_done()
+
+            clock.now = until
+            for unsub in unsubs:
+                unsub()
+            for c in coordinators:
+                await c.async_shutdown()
+
+    published = [p for d in _market_dates(started_at, until) for p in server.published(d) if started_at <= p.at <= until]
+    return LoadReport(
+        requests=list(server.requests),
+        fetch_latencies=latencies,
+        fresh_after={p: fresh_at[p] - p.at if p in fresh_at else None for p in published},
+        wake_ups=wake_ups,
+        days=(until - started_at) / timedelta(days=1),
+        held=dict(coordinator.data.results) if coordinator.data is not None else {},
+    )
+
+
+def _market_dates(start: datetime, end: datetime) -> list[date]:
+    first, last = start.astimezone(CET).date() - timedelta(days=1), end.astimezone(CET).date() + timedelta(days=1)
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def _percentile(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, math.floor(p * len(values)))] if values else 0.0
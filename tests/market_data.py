@@ -0,0 +1,80 @@
+"""Synthetic OMIE market data for the tests and benchmarks. Nothing here touches the network."""
+from __future__ import annotations
+
+import random
+from datetime import date, datetime, timedelta, timezone
+
+from pyomie.model import OMIEResults, SpotData
+
+from custom_components.omie.const import CET
+from custom_components.omie.forecast import OMIEForecaster
+from custom_components.omie.model import OMIEMarketWindow
+from custom_components.omie.series import local_midnight, QUARTER_HOUR
+from custom_components.omie.view import OMIEMarketView
+
+MARKET_DAYS = {
+    "normal": date(2026, 6, 15),
+    "dst_start": date(2026, 3, 29),  # 92 quarter-hours
+    "dst_end": date(2026, 10, 25),  # 100 quarter-hours
+}
+"""Today's market date (CET) in each scenario."""
+
+TIME_ZONES = ["Europe/Lisbon", "Europe/Madrid", "America/New_York"]
+"""Home Assistant time zones: both Iberian ones and one that is not."""
+
+
+def cet_quarter_hours(market_date: date) -> int:
+    """Number of quarter-hours in the market date (CET)."""
+    return (local_midnight(market_date + timedelta(days=1), CET) - local_midnight(market_date, CET)) // QUARTER_HOUR
+
+
+def spot_results(market_date: date) -> OMIEResults[SpotData]:
+    """Returns plausible spot results for the market date. The same date always gets the same prices."""
+    rng = random.Random(market_date.toordinal())
+    n = cet_quarter_hours(market_date)
+    es_prices = [round(rng.uniform(-5, 250), 2) for _ in range(n)]
+    pt_prices = [p if rng.random() < 0.9 else round(p + rng.uniform(-20, 20), 2) for p in es_prices]
+    power = [round(rng.uniform(15_000, 40_000), 1) for _ in range(n)]
+
+    return OMIEResults(
+        updated_at=datetime.combine(market_date - timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc),
+        market_date=market_date,
+        contents=SpotData(
+            url=f"https://example.invalid/{market_date.isoformat()}",
+            market_date=market_date.isoformat(),
+            header="OMIE - Mercado de electricidad;",
+            es_pt_total_power=power,
+            es_purchases_power=power,
+            pt_purchases_power=power,
+            es_sales_power=power,
+            pt_sales_power=power,
+            es_pt_power=power,
+            es_to_pt_exports_power=power,
+            es_from_pt_imports_power=power,
+            es_spot_price=es_prices,
+            pt_spot_price=pt_prices,
+        ),
+        raw="",
+    )
+
+
+def market_window(today: date) -> OMIEMarketWindow[SpotData]:
+    """Returns a window holding yesterday, today and tomorrow."""
+    return OMIEMarketWindow(
+        market_date=today,
+        results={d: spot_results(d) for d in [today - timedelta(days=1), today, today + timedelta(days=1)]},
+    )
+
+
+class FixedCoordinator:
+    """Stands in for an `OMIEMarketCoordinator` that holds a fixed window of results."""
+    name = "omie.benchmark"
+
+    def __init__(self, data: OMIEMarketWindow[SpotData]) -> None:
+        self.data = data
+
+
+def forecast_view(window: OMIEMarketWindow[SpotData]) -> OMIEMarketView:
+    """Returns a view of the window that forecasts the Portuguese spot prices from the window alone."""
+    coordinator = FixedCoordinator(window)
+    return OMIEMarketView(None, coordinator, forecaster=OMIEForecaster(None, coordinator, None, ("pt_spot_price",)))
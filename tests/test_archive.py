@@ -0,0 +1,118 @@
+"""Tests of the spot price archive: its files, its backfill and the statistics that it imports."""
+from __future__ import annotations
+
+import asyncio
+import math
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import pytest
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.statistics import statistics_during_period
+from homeassistant.core import HomeAssistant
+from pytest_homeassistant_custom_component.components.recorder.common import async_wait_recording_done
+
+from custom_components.omie.archive import OMIEArchive, statistic_id
+from custom_components.omie.const import CET
+from custom_components.omie.fetch import Fetched, Validators
+from custom_components.omie.series import local_midnight
+
+from .market_data import FixedCoordinator, market_window, spot_results, cet_quarter_hours
+
+_BACKFILL_DAYS = 5
+
+
+@pytest.fixture(autouse=True)
+def archive_dir(tmp_path):
+    """Keeps the archive files out of the shared test config dir, and backfills without pausing between fetches."""
+    # a real client session leaves its resolver's thread behind
+    with patch("custom_components.omie.archive.archive_path", lambda hass: str(tmp_path)), \
+            patch("custom_components.omie.archive._BACKFILL_INTERVAL", timedelta(0)), \
+            patch("custom_components.omie.archive.async_get_clientsession"):
+        yield
+
+
+def _archive(hass: HomeAssistant, market_day: date, fetched: list[date] | None = None, fail: set[date] = frozenset()):
+    async def market_fetcher(client_session, market_date: date, validators: Validators | None) -> Fetched:
+        if fetched is not None:
+            fetched.append(market_date)
+        if market_date in fail:
+            # e.g. a truncated file, which the parser does not expect
+            raise IndexError("list index out of range")
+        return Fetched(spot_results(market_date), Validators(etag=market_date.isoformat()))
+
+    return OMIEArchive(hass, FixedCoordinator(market_window(market_day)), market_fetcher,
+                       start=market_day - timedelta(days=_BACKFILL_DAYS))
+
+
+async def test_round_trip(hass: HomeAssistant, market_day):
+    """Days read back from the files after a reload have the prices that were stored, including both DST days."""
+    stored = [market_day - timedelta(days=1), market_day]
+    await _archive(hass, market_day)._async_store(spot_results(d) for d in stored)
+
+    reloaded = _archive(hass, market_day)
+    await reloaded.async_load()
+    assert reloaded.diagnostics()["days"] == len(stored)
+
+    series = await reloaded.async_series("pt_spot_price", stored[0], market_day + timedelta(days=2))
+    assert series.start == local_midnight(stored[0], CET)
+    assert series.end == local_midnight(market_day + timedelta(days=2), CET)
+    archived = len(series) - cet_quarter_hours(market_day + timedelta(days=1))
+    assert list(series.values[:archived]) == [p for d in stored for p in spot_results(d).contents.pt_spot_price]
+    assert all(math.isnan(v) for v in series.values[archived:])
+
+
+async def test_backfill_resumes(hass: HomeAssistant, market_day):
+    """A day that cannot be backfilled is skipped, and only it is fetched again after a reload."""
+    fetched: list[date] = []
+    failed = market_day - timedelta(days=2)
+    archive = _archive(hass, market_day, fetched, fail={failed})
+    await archive.async_backfill()
+
+    assert sorted(fetched) == [market_day - timedelta(days=n) for n in range(_BACKFILL_DAYS, 0, -1)]
+    assert archive.missing(market_day) == [failed]
+    assert archive.stats.counters["backfill_errors"] == 1
+
+    fetched.clear()
+    reloaded = _archive(hass, market_day, fetched)
+    await reloaded.async_load()
+    await reloaded.async_backfill()
+    assert fetched == [failed]
+    assert reloaded.missing(market_day) == []
+
+
+async def test_imports_statistics(recorder_mock, hass: HomeAssistant, market_day):
+    """The hourly mean, min and max of every archived day go into long-term statistics, 23 or 25 hours on DST days."""
+    await _archive(hass, market_day)._async_store([spot_results(market_day)])
+    await async_wait_recording_done(hass)
+
+    start, end = local_midnight(market_day, CET), local_midnight(market_day + timedelta(days=1), CET)
+    statistics = await get_instance(hass).async_add_executor_job(
+        statistics_during_period, hass, start, end, {statistic_id("pt_spot_price")}, "hour", None, {"mean", "min", "max"})
+
+    hours = statistics[statistic_id("pt_spot_price")]
+    assert len(hours) == cet_quarter_hours(market_day) // 4
+    prices = spot_results(market_day).contents.pt_spot_price
+    assert hours[0]["min"] == pytest.approx(min(prices[:4]))
+    assert hours[0]["max"] == pytest.approx(max(prices[:4]))
+    assert hours[0]["mean"] == pytest.approx(sum(prices[:4]) / 4, abs=0.01)
+
+
+async def test_concurrent_stores(hass: HomeAssistant, market_day):
+    """Stores that run at the same time into a year file that does not exist yet keep every day, and each day's
+    statistics are only imported once."""
+    days = [market_day - timedelta(days=n) for n in range(_BACKFILL_DAYS, 0, -1)]
+    archive = _archive(hass, market_day)
+    imported: list[date] = []
+    with patch.object(archive, "_import_statistics", lambda records: imported.extend(records)):
+        await asyncio.gather(*[archive._async_store(spot_results(d) for d in stored)
+                               for stored in (days[:3], days[2:], days[1:4], days)])
+
+    assert sorted(imported) == days
+    assert archive.stats.counters["days_archived"] == len(days)
+
+    reloaded = _archive(hass, market_day)
+    await reloaded.async_load()
+    assert reloaded.missing(market_day) == []
+    series = await reloaded.async_series("es_spot_price", days[0], market_day)
+    assert list(series.values) == [p for d in days for p in spot_results(d).contents.es_spot_price]
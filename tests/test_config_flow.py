@@ -0,0 +1,49 @@
+"""Tests for adding further config entries, which are told apart by their names."""
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import pytest
+from homeassistant import config_entries
+from homeassistant.const import CONF_NAME
+from homeassistant.data_entry_flow import FlowResultType
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.omie.const import DOMAIN
+
+
+async def _add_named(hass, name: str):
+    result = await hass.config_entries.flow.async_init(DOMAIN, context={"source": config_entries.SOURCE_USER})
+    assert result["step_id"] == "name"
+    with patch("custom_components.omie.async_setup_entry", return_value=True):
+        return await hass.config_entries.flow.async_configure(result["flow_id"], {CONF_NAME: name})
+
+
+@pytest.fixture
+def entries(hass, enable_custom_integrations):
+    """The first config entry, which has no name, and one named "My Tariff"."""
+    MockConfigEntry(domain=DOMAIN, data={}).add_to_hass(hass)
+    MockConfigEntry(domain=DOMAIN, title="My Tariff", data={CONF_NAME: "My Tariff"}).add_to_hass(hass)
+
+
+async def test_add_named(hass, entries):
+    """A name that gives the entities their own ids creates an entry."""
+    result = await _add_named(hass, "Other Tariff")
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert result["data"] == {CONF_NAME: "Other Tariff"}
+
+
+@pytest.mark.parametrize("name", ["My Tariff", "my-tariff", "MY_TARIFF ", "my tariff!"])
+async def test_same_ids_aborts(hass, entries, name):
+    """Names that only differ in case or punctuation would give the entities the same ids."""
+    result = await _add_named(hass, name)
+    assert result["type"] is FlowResultType.ABORT
+    assert result["reason"] == "already_configured"
+
+
+@pytest.mark.parametrize("name", ["!!!", " ", "_"])
+async def test_no_usable_characters(hass, entries, name):
+    """A name without letters or digits would give the entities the first entry's ids."""
+    result = await _add_named(hass, name)
+    assert result["type"] is FlowResultType.FORM
+    assert result["errors"] == {CONF_NAME: "name_invalid"}
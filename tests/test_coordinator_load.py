@@ -0,0 +1,75 @@
+"""Load tests for the coordinator's refresh schedule, run against the fake OMIE server over several simulated days."""
+from __future__ import annotations
+
+import random
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from custom_components.omie.coordinator import _RETRY_MAX_DELAY, _SCHEDULE_MAX_DELAY
+
+from .load import run_coordinator, LoadReport
+from .market_data import MARKET_DAYS, cet_quarter_hours
+
+
+def _report(record_property, report: LoadReport) -> None:
+    for key, value in report.summary().items():
+        record_property(key, value)
+
+
+@pytest.mark.parametrize("scenario", list(MARKET_DAYS))
+async def test_day_ahead_on_time(hass, fake_omie, record_property, scenario):
+    """Day-ahead results that are published on schedule are fetched straight away, once."""
+    start = MARKET_DAYS[scenario] - timedelta(days=2)
+    server = await fake_omie(start)
+    report = await run_coordinator(hass, server, until=server.clock() + timedelta(days=4))
+    _report(record_property, report)
+
+    assert report.max_fresh_after is not None and report.max_fresh_after <= _SCHEDULE_MAX_DELAY
+    # yesterday and today on startup, then each tomorrow as it is published
+    assert len(report.requests) == 2 + 4
+    assert all(r.status == 200 for r in report.requests)
+
+
+@pytest.mark.parametrize("scenario", list(MARKET_DAYS))
+async def test_day_ahead_late_and_flaky(hass, fake_omie, record_property, scenario):
+    """Late publications and server errors are retried with a bounded delay and without flooding the server."""
+    start = MARKET_DAYS[scenario] - timedelta(days=2)
+    server = await fake_omie(start, publication_lag=(timedelta(minutes=-5), timedelta(minutes=45)),
+                             latency=timedelta(milliseconds=5), failure_rate=0.2, seed=MARKET_DAYS[scenario].toordinal())
+    report = await run_coordinator(hass, server, until=server.clock() + timedelta(days=4))
+    _report(record_property, report)
+
+    # a retry after the maximum back-off could itself fail, so allow for two
+    assert report.max_fresh_after is not None and report.max_fresh_after <= 2 * _RETRY_MAX_DELAY * 1.1 + _SCHEDULE_MAX_DELAY
+    assert report.requests_per_day <= 15
+
+
+@pytest.mark.parametrize("scenario", ["dst_start", "dst_end"])
+async def test_dst_days_are_complete(hass, fake_omie, scenario):
+    """The files for the days on which DST starts and ends are fetched on time with all of their quarter-hours."""
+    market_date = MARKET_DAYS[scenario]
+    server = await fake_omie(market_date - timedelta(days=1))
+    report = await run_coordinator(hass, server, until=server.clock() + timedelta(days=1))
+
+    assert report.max_fresh_after is not None and report.max_fresh_after <= _SCHEDULE_MAX_DELAY
+    assert len(report.held[market_date].contents.es_spot_price) == cet_quarter_hours(market_date)
+
+
+@pytest.mark.parametrize("scenario", list(MARKET_DAYS))
+async def test_entries_share_fetches(hass, fake_omie, record_property, scenario):
+    """Several config entries make the same requests as one, each of them holding every version as soon as it would alone."""
+    start, seed = MARKET_DAYS[scenario] - timedelta(days=2), MARKET_DAYS[scenario].toordinal()
+    runs = []
+    for entries in (1, 3):
+        server = await fake_omie(start, publication_lag=(timedelta(minutes=-5), timedelta(minutes=45)),
+                                 latency=timedelta(milliseconds=5), failure_rate=0.2, seed=seed)
+        # the same timer delay and retry jitter in both runs, so that only the number of entries differs
+        with patch("custom_components.omie.coordinator.random", random.Random(seed)):
+            runs.append(await run_coordinator(hass, server, until=server.clock() + timedelta(days=4), entries=entries))
+    alone, shared = runs
+    _report(record_property, shared)
+
+    assert shared.requests == alone.requests
+    assert shared.fresh_after == alone.fresh_after
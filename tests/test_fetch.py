@@ -0,0 +1,111 @@
+"""Tests of the conditional fetches of the market files and of the fetches shared between config entries."""
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+
+import pytest
+from aiohttp import ClientSession, ClientResponseError, TCPConnector, ThreadedResolver, web
+from aiohttp.test_utils import TestServer
+
+from custom_components.omie.coordinator import spot_price
+from custom_components.omie.fetch import OMIEFetchCache, fetch_market_file
+
+from .market_data import MARKET_DAYS
+
+_MARKET_DATE = MARKET_DAYS["normal"]
+
+
+@pytest.fixture
+async def client_session():
+    # the fake server needs no DNS, and the asynchronous resolver leaves a thread behind when it is closed
+    async with ClientSession(connector=TCPConnector(resolver=ThreadedResolver())) as client_session:
+        yield client_session
+
+
+@pytest.fixture
+async def server(fake_omie):
+    """A fake OMIE server on which today's file is published."""
+    return await fake_omie(_MARKET_DATE)
+
+
+async def test_revalidate_not_modified(server, client_session):
+    """A held file whose ETag still matches is not downloaded again."""
+    first = await spot_price(client_session, _MARKET_DATE, None, base_url=server.base_url)
+    assert first.results is not None and first.validators.etag is not None
+
+    again = await spot_price(client_session, _MARKET_DATE, first.validators, base_url=server.base_url)
+    assert again.results is None
+    assert again.validators == first.validators
+    assert again.downloaded == 0
+    assert [r.status for r in server.requests] == [200, 304]
+
+
+async def test_revalidate_same_digest(server, client_session):
+    """A held file that is downloaded again, as its ETag is not known, is not parsed again if the body is unchanged."""
+    first = await spot_price(client_session, _MARKET_DATE, None, base_url=server.base_url)
+
+    again = await spot_price(client_session, _MARKET_DATE, first.validators._replace(etag=None), base_url=server.base_url)
+    assert again.results is None
+    assert again.validators == first.validators
+    assert again.downloaded == first.downloaded
+    assert again.parse_ms == 0.0
+    assert [r.status for r in server.requests] == [200, 200]
+
+
+async def test_not_modified_without_validators(socket_enabled, client_session):
+    """A 304 to an unconditional request leaves nothing to serve, so it is a fetch error."""
+
+    async def not_modified(request: web.Request) -> web.Response:
+        return web.Response(status=304)
+
+    app = web.Application()
+    app.router.add_get("/{path:.*}", not_modified)
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        with pytest.raises(ClientResponseError):
+            await fetch_market_file(client_session, str(server.make_url("/file.TXT")), _MARKET_DATE, None, None)
+    finally:
+        await server.close()
+
+
+async def test_shared_fetch(server, client_session):
+    """Entries that check the same file at the same time make one request, and get the results that they do not hold."""
+    cache = OMIEFetchCache()
+    now = server.clock()
+    fetch = lambda validators: spot_price(client_session, _MARKET_DATE, validators, base_url=server.base_url)
+
+    first, second = await asyncio.gather(*[cache.async_fetch("spot", _MARKET_DATE, None, now, None, fetch) for _ in range(2)])
+    assert first.results is not None and second.results is first.results
+    assert len(server.requests) == 1
+
+    # an entry that already holds the shared version is told that it is unchanged
+    held = await cache.async_fetch("spot", _MARKET_DATE, first.validators, now, None, fetch)
+    assert held.results is None and held.validators == first.validators
+    assert len(server.requests) == 1
+    assert cache.stats.counters["shared"] == 2
+
+
+async def test_shared_fetch_falls_through(server, client_session):
+    """An entry makes its own request when the shared fetch is older than its last check, or found no change to a
+    version that the entry does not hold."""
+    cache = OMIEFetchCache()
+    now = server.clock()
+    fetch = lambda validators: spot_price(client_session, _MARKET_DATE, validators, base_url=server.base_url)
+    first = await fetch(None)
+    server.requests.clear()
+
+    # the entry that holds the file finds it unchanged, which is no use to an entry that holds nothing
+    unchanged = await cache.async_fetch("spot", _MARKET_DATE, first.validators, now, None, fetch)
+    assert unchanged.results is None
+    fetched = await cache.async_fetch("spot", _MARKET_DATE, None, now, None, fetch)
+    assert fetched.results is not None
+    assert [r.status for r in server.requests] == [304, 200]
+
+    # an entry that last checked after the shared fetch started checks again
+    later = now + timedelta(minutes=1)
+    again = await cache.async_fetch("spot", _MARKET_DATE, fetched.validators, later, now, fetch)
+    assert again.results is None
+    assert [r.status for r in server.requests] == [304, 200, 304]
+    assert cache.stats.counters["requests"] == 3
@@ -0,0 +1,35 @@
+"""Tests for the forecast of the prices that are not published yet."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from custom_components.omie.const import CET
+from custom_components.omie.forecast import OMIEForecaster, FORECAST_DAYS
+from custom_components.omie.series import local_midnight
+
+from .market_data import FixedCoordinator, market_window, cet_quarter_hours, forecast_view
+
+
+def test_forecast_follows_published_prices(market_day, local_tz):
+    """The forecast starts where the published prices end and covers every remaining market day in full."""
+    view = forecast_view(market_window(market_day))
+    forecast = view.forecast("pt_spot_price")
+
+    assert forecast.start == view.series("pt_spot_price").end
+    assert forecast.end == local_midnight(market_day + timedelta(days=FORECAST_DAYS + 1), CET)
+    assert forecast.complete()
+    for n in range(2, FORECAST_DAYS + 1):
+        assert len(forecast.local_day(market_day + timedelta(days=n), CET)) == cet_quarter_hours(market_day + timedelta(days=n))
+
+
+def test_learns_each_day_once(market_day):
+    window = market_window(market_day)
+    forecaster = OMIEForecaster(None, FixedCoordinator(window), None, ("pt_spot_price", "es_spot_price"))
+
+    forecaster.learn(window)
+    forecaster.learn(window)
+    assert forecaster.version == len(window.results)
+    assert sum(forecaster.models["pt_spot_price"].days) == len(window.results)
+
+    forecaster.learn(market_window(market_day + timedelta(days=1)))
+    assert forecaster.version == len(window.results) + 1
@@ -0,0 +1,83 @@
+"""Tests for the localization of the market data into local days."""
+from __future__ import annotations
+
+from zoneinfo import ZoneInfo
+
+import pytest
+import pytz
+from homeassistant.helpers.json import json_bytes
+
+from custom_components.omie.const import PRICE_ATTRIBUTES_FULL, RESOLUTION_HOURLY, RESOLUTION_QUARTER_HOURLY
+from custom_components.omie.sensor import _price_attributes
+from custom_components.omie.series import QUARTER_HOUR, HOUR
+from custom_components.omie.view import OMIEMarketView
+
+from .market_data import FixedCoordinator, market_window, MARKET_DAYS
+
+
+@pytest.mark.parametrize("zone", [ZoneInfo, pytz.timezone], ids=["zoneinfo", "pytz"])
+@pytest.mark.parametrize("tz_name", ["Europe/Lisbon", "Europe/Madrid"])
+@pytest.mark.parametrize("scenario, quarter_hours", [("dst_start", 92), ("dst_end", 100)])
+def test_dst_local_day(zone, tz_name, scenario, quarter_hours):
+    """The 23- and 25-hour local days have every one of their quarter-hours, whichever kind of time zone they are in."""
+    tz, market_day = zone(tz_name), MARKET_DAYS[scenario]
+    day = OMIEMarketView(None, FixedCoordinator(market_window(market_day))).series("pt_spot_price").local_day(market_day, tz)
+
+    assert len(day) == quarter_hours
+    assert day.end - day.start == quarter_hours * QUARTER_HOUR
+    assert day.complete()
+    assert len(day.as_dict(tz)) == quarter_hours
+    assert [k.isoformat() for k in day.as_dict(tz)] == [i.astimezone(tz).isoformat() for i in day.instants()]
+
+
+@pytest.mark.parametrize("tz_name", ["Europe/Lisbon", "Europe/Madrid"])
+@pytest.mark.parametrize("scenario, hours", [("dst_start", 23), ("dst_end", 25)])
+def test_dst_hourly(tz_name, scenario, hours):
+    """The 23- and 25-hour local days have 23 or 25 hourly averages in a zoneinfo time zone, as Home Assistant uses."""
+    tz, market_day = ZoneInfo(tz_name), MARKET_DAYS[scenario]
+    view = OMIEMarketView(None, FixedCoordinator(market_window(market_day)))
+    day = view.series("pt_spot_price").local_day(market_day, tz)
+
+    assert len(day.hourly()) == hours
+    assert [k.isoformat() for k in day.as_hourly_dict(tz)] == [
+        (day.start + h * HOUR).astimezone(tz).isoformat() for h in range(hours)]
+    assert len(view.localized("pt_spot_price", tz, market_day, resolution=RESOLUTION_HOURLY).today.hours) == hours
+
+
+def test_hourly_averages(market_day, local_tz):
+    """Each hourly average is the average of the hour's quarter-hours."""
+    day = OMIEMarketView(None, FixedCoordinator(market_window(market_day))).series("pt_spot_price").local_day(market_day, local_tz)
+    hourly = day.hourly()
+    assert len(hourly) * 4 == len(day)
+    for h, average in enumerate(hourly):
+        assert average == round(sum(day.values[h * 4:h * 4 + 4]) / 4, 2)
+
+
+def test_hourly_attributes_are_smaller(market_day, local_tz):
+    """The hourly attributes are at least 3 times smaller than the quarter-hourly ones."""
+    view = OMIEMarketView(None, FixedCoordinator(market_window(market_day)))
+    hourly, full = (_price_attributes(view.localized("pt_spot_price", local_tz, market_day, resolution=r), PRICE_ATTRIBUTES_FULL)
+                    for r in (RESOLUTION_HOURLY, RESOLUTION_QUARTER_HOURLY))
+    assert len(json_bytes(hourly)) * 3 < len(json_bytes(full))
+
+
+def test_views_share_cache():
+    """The views of different sources share one cache, but each only drops its own entries."""
+    today, later = MARKET_DAYS["normal"], MARKET_DAYS["dst_end"]
+    cache = {}
+    spot, other = FixedCoordinator(market_window(today)), FixedCoordinator(market_window(today))
+    other.name = "omie.other"
+    spot_view, other_view = OMIEMarketView(None, spot, cache), OMIEMarketView(None, other, cache)
+    tz = ZoneInfo("Europe/Lisbon")
+    spot_view.localized("pt_spot_price", tz, today)
+    other_view.localized("pt_spot_price", tz, today)
+    other_keys = {k for k in cache if k[0] == other.name}
+    assert other_keys and len(cache) > len(other_keys)
+
+    # new data only prunes the entries of the view whose coordinator changed
+    spot.data = market_window(later)
+    assert spot_view.localized("pt_spot_price", tz, later) is not None
+    assert other_keys <= set(cache)
+
+    spot_view.async_setup()()
+    assert set(cache) == other_keys
@@ -0,0 +1,59 @@
+"""Tests for serving the results persisted by a previous run, before (or without) fetching them again."""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from aiohttp import ClientConnectionError
+
+from custom_components.omie.const import DOMAIN
+from custom_components.omie.coordinator import STORAGE_VERSION
+from custom_components.omie.fetch import Validators
+
+from .market_data import spot_results
+
+_NOW = datetime(2026, 6, 15, 12, 7, tzinfo=timezone.utc)
+_TODAY = date(2026, 6, 15)
+
+
+def _stored(market_dates: list[date], checked_at: datetime) -> dict:
+    return {
+        "version": STORAGE_VERSION,
+        "minor_version": 1,
+        "key": f"{DOMAIN}.spot",
+        "data": {"results": [{
+            "updated_at": checked_at.isoformat(),
+            "checked_at": checked_at.isoformat(),
+            "market_date": d.isoformat(),
+            "validators": Validators(etag=d.isoformat())._asdict(),
+            "contents": spot_results(d).contents._asdict(),
+        } for d in market_dates]},
+    }
+
+
+# the fake datetimes would leak into the attributes, whose keys they cannot be
+@pytest.mark.freeze_time(_NOW, ignore=["custom_components"])
+@pytest.mark.parametrize("checked_at, fetches", [
+    (_NOW - timedelta(minutes=5), 0),  # after every file in the window was published
+    (_NOW - timedelta(days=1), 1),  # before tomorrow's file was published
+], ids=["fresh", "stale"])
+async def test_restore_offline(hass, hass_storage, setup_omie, checked_at, fetches):
+    """Entities come up with the stored prices of the days that are still in the window, even if the ones that have been
+    published since cannot be fetched, and the stored days that are up to date are not fetched again."""
+    window = [_TODAY - timedelta(days=1), _TODAY, _TODAY + timedelta(days=1)]
+    hass_storage[f"{DOMAIN}.spot"] = _stored([_TODAY - timedelta(days=5), *window], checked_at)
+    fetched: list[date] = []
+
+    async def offline(client_session, url, market_date: date, parse, validators: Validators | None):
+        fetched.append(market_date)
+        raise ClientConnectionError("offline")
+
+    entry = await setup_omie(fetch=offline)
+
+    assert len(fetched) == fetches
+    coordinator = hass.data[DOMAIN].entries[entry.entry_id].spot
+    assert list(coordinator.data.results) == window
+    # 14:07 in Lisbon is 14:00 of the market date (CET)
+    state = hass.states.get("sensor.omie_spot_price_pt")
+    assert float(state.state) == spot_results(_TODAY).contents.pt_spot_price[14 * 4]
+    assert len(state.attributes["tomorrow_hours"]) == 96
@@ -0,0 +1,25 @@
+"""Tests for the price sensors, in the zoneinfo time zones that Home Assistant hands out."""
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from custom_components.omie.const import CONF_RESOLUTION, RESOLUTION_BOTH
+
+from .market_data import spot_results
+
+
+# the fake datetimes would leak into the attributes, whose keys they cannot be
+@pytest.mark.freeze_time("2026-10-25 23:30:00+00:00", ignore=["custom_components"])
+async def test_last_hour_of_dst_end(hass, setup_omie):
+    """In the last local hour of the 25-hour day the sensor has a price, and the day has all its quarter-hours and hours."""
+    await hass.config.async_set_time_zone("Europe/Lisbon")
+    await setup_omie({CONF_RESOLUTION: RESOLUTION_BOTH})
+
+    state = hass.states.get("sensor.omie_spot_price_pt")
+    # 23:30 in Lisbon is 00:30 of the next market date (CET)
+    assert float(state.state) == spot_results(date(2026, 10, 26)).contents.pt_spot_price[2]
+    assert len(state.attributes["today_hours"]) == 100
+    assert len(state.attributes["today_hourly"]) == 25
+    assert not state.attributes["today_provisional"]
@@ -0,0 +1,88 @@
+"""Tests for the actions, which return the same localized prices as the sensors."""
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+import voluptuous as vol
+
+from custom_components.omie.const import DOMAIN, CET
+from custom_components.omie.series import local_midnight
+from custom_components.omie.services import SERVICE_GET_PRICES, SERVICE_CHEAPEST_WINDOW, SERVICE_CHEAPEST_QUARTER_HOURS
+
+
+# the fake datetimes would leak into the attributes, whose keys they cannot be
+@pytest.mark.freeze_time("2026-10-25 15:00:00+00:00", ignore=["custom_components"])
+async def test_get_prices_on_dst_end(hass, setup_omie):
+    """The 25-hour day has 100 quarter-hours, both runs of the repeated hour included, in Home Assistant's time zone."""
+    await hass.config.async_set_time_zone("Europe/Lisbon")
+    await setup_omie()
+
+    response = await hass.services.async_call(DOMAIN, SERVICE_GET_PRICES, {"country": "pt"}, blocking=True, return_response=True)
+    today = response["today"]
+    assert today["start"] == "2026-10-25T00:00:00+01:00"
+    assert len(today["values"]) == 100
+    assert None not in today["values"]
+    assert not today["provisional"]
+
+
+@pytest.mark.freeze_time("2026-06-15 12:07:00+00:00", ignore=["custom_components"])
+async def test_cheapest_window_duration(hass, setup_omie):
+    """The duration is rounded up to whole quarter-hours, and the window starts no earlier than the current one."""
+    await setup_omie()
+
+    response = await _call(hass, SERVICE_CHEAPEST_WINDOW, {"country": "es", "duration": "00:20:00"})
+    start, end = datetime.fromisoformat(response["start"]), datetime.fromisoformat(response["end"])
+    assert end - start == timedelta(minutes=30)
+    assert start >= datetime(2026, 6, 15, 12, tzinfo=timezone.utc)
+
+    for duration in ["00:00:00", "-01:00:00", "soon"]:
+        with pytest.raises(vol.Invalid):
+            await _call(hass, SERVICE_CHEAPEST_WINDOW, {"country": "es", "duration": duration})
+
+
+@pytest.mark.freeze_time("2026-06-15 12:07:00+00:00", ignore=["custom_components"])
+async def test_most_expensive_window(hass, setup_omie):
+    """The most expensive window is the one with the highest average of all those in the range."""
+    entry = await setup_omie()
+    prices = hass.data[DOMAIN].entries[entry.entry_id].spot_view.series("pt_spot_price")
+    start, end = datetime(2026, 6, 15, 12, tzinfo=timezone.utc), datetime(2026, 6, 16, tzinfo=timezone.utc)
+    values = prices.slice(start, end).values
+    averages = [sum(values[i:i + 4]) / 4 for i in range(len(values) - 3)]
+
+    response = await _call(hass, SERVICE_CHEAPEST_WINDOW, {"country": "pt", "duration": "01:00:00", "end": end.isoformat(),
+                                                           "most_expensive": True})
+    assert response["average"] == round(max(averages), 2)
+    cheapest = await _call(hass, SERVICE_CHEAPEST_WINDOW, {"country": "pt", "duration": "01:00:00", "end": end.isoformat()})
+    assert cheapest["average"] == round(min(averages), 2)
+
+
+@pytest.mark.freeze_time("2026-06-15 12:07:00+00:00", ignore=["custom_components"])
+async def test_search_bounds(hass, setup_omie):
+    """A range that reaches past the known prices only searches those, and one entirely past them finds nothing."""
+    await setup_omie()
+    known_end = local_midnight(date(2026, 6, 17), CET)
+
+    response = await _call(hass, SERVICE_CHEAPEST_QUARTER_HOURS, {
+        "country": "pt", "count": 4, "start": "2020-01-01T00:00:00+00:00", "end": "2030-01-01T00:00:00+00:00"})
+    assert len(response["quarter_hours"]) == 4
+    assert all(datetime.fromisoformat(qh["start"]) < known_end for qh in response["quarter_hours"])
+
+    past = {"country": "pt", "start": known_end.isoformat()}
+    assert await _call(hass, SERVICE_CHEAPEST_WINDOW, {**past, "duration": "01:00:00"}) == \
+           {"start": None, "end": None, "average": None}
+    assert await _call(hass, SERVICE_CHEAPEST_QUARTER_HOURS, {**past, "count": 1}) == {"quarter_hours": [], "average": None}
+
+
+@pytest.mark.freeze_time("2026-06-15 12:07:00+00:00", ignore=["custom_components"])
+async def test_more_quarter_hours_than_known(hass, setup_omie):
+    """Asking for more quarter-hours than there are known prices in the range finds nothing."""
+    await setup_omie()
+
+    data = {"country": "es", "start": "2026-06-15T12:00:00+00:00", "end": "2026-06-15T13:00:00+00:00"}
+    assert len((await _call(hass, SERVICE_CHEAPEST_QUARTER_HOURS, {**data, "count": 4}))["quarter_hours"]) == 4
+    assert await _call(hass, SERVICE_CHEAPEST_QUARTER_HOURS, {**data, "count": 5}) == {"quarter_hours": [], "average": None}
+
+
+async def _call(hass, service: str, data: dict) -> dict:
+    return await hass.services.async_call(DOMAIN, service, data, blocking=True, return_response=True)
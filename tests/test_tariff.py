@@ -0,0 +1,45 @@
+"""Tests for the tariffs, which derive retail prices from the spot prices."""
+from __future__ import annotations
+
+import math
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from custom_components.omie.series import QuarterHourSeries, local_midnight, QUARTER_HOUR
+from custom_components.omie.tariff import Tariff, PERIOD_TABLES, tariff_from_options
+
+from .market_data import MARKET_DAYS
+
+
+def test_formula():
+    series = QuarterHourSeries(datetime(2026, 1, 15, 12, tzinfo=pytz.utc), [50.0, None])
+    tariffed = Tariff(table="pt_simple", multiplier=1.1, adder=5.0, access=(20.0,), vat=0.23).apply(series)
+    assert tariffed.values[0] == round((50.0 * 1.1 + 5.0 + 20.0) * 1.23, 2)
+    assert math.isnan(tariffed.values[1])
+
+
+@pytest.mark.parametrize("market_day", list(MARKET_DAYS.values()), ids=list(MARKET_DAYS))
+def test_pt_tri_daily_periods(market_day):
+    """Every local day has 10h of vazio and 4h of ponta, whatever its length."""
+    table = PERIOD_TABLES["pt_tri_daily"]
+    day = QuarterHourSeries.span(local_midnight(market_day, table.tz), local_midnight(market_day + timedelta(days=1), table.tz), [])
+    hours = {table.periods[p]: n * QUARTER_HOUR for p, n in Counter(table.period_indices(day)).items()}
+    assert hours["vazio"] == timedelta(hours=10) + (day.end - day.start - timedelta(days=1))
+    assert hours["ponta"] == timedelta(hours=4)
+
+
+def test_es_2_0td_weekend():
+    table = PERIOD_TABLES["es_2_0td"]
+    saturday = local_midnight(datetime(2026, 1, 17).date(), table.tz)
+    day = QuarterHourSeries.span(saturday, saturday + timedelta(days=1), [])
+    assert set(table.period_indices(day)) == {table.periods.index("P3")}
+
+
+def test_access_charges_must_match_periods():
+    assert tariff_from_options({"tariff": "none"}) is None
+    assert tariff_from_options({"tariff": "es_2_0td"}).access == (0.0, 0.0, 0.0)
+    with pytest.raises(ValueError):
+        tariff_from_options({"tariff": "es_2_0td", "tariff_access": "1,2"})
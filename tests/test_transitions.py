@@ -0,0 +1,47 @@
+"""Tests for the price transitions that drive the binary sensors and events."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+import pytest
+
+from custom_components.omie.series import local_midnight
+from custom_components.omie.transitions import PriceCondition, conditions_from_options
+from custom_components.omie.view import OMIEMarketView
+
+from .market_data import FixedCoordinator, market_window
+
+_CONDITIONS = (PriceCondition(key="below_100", threshold=100.0), PriceCondition(key="cheapest_25", cheapest_share=25))
+
+
+def test_cheapest_share_of_each_local_day(market_day, local_tz):
+    view = OMIEMarketView(None, FixedCoordinator(market_window(market_day)))
+    prices = view.series("pt_spot_price")
+    transitions = view.transitions("pt_spot_price", local_tz, _CONDITIONS)
+    cheapest = _CONDITIONS[1]
+
+    for day in (market_day + timedelta(days=n) for n in (-1, 0, 1)):
+        start, end = local_midnight(day, local_tz), local_midnight(day + timedelta(days=1), local_tz)
+        if start < prices.start or end > prices.end:
+            continue
+        quarter_hours = list(prices.slice(start, end).instants())
+        active = sum(transitions.state(cheapest, i) for i in quarter_hours)
+        assert active == round(len(quarter_hours) * 0.25)
+
+
+def test_threshold_state_follows_prices(market_day, local_tz):
+    view = OMIEMarketView(None, FixedCoordinator(market_window(market_day)))
+    prices = view.series("pt_spot_price")
+    transitions = view.transitions("pt_spot_price", local_tz, _CONDITIONS)
+
+    for instant, value in zip(prices.instants(), prices.values):
+        assert transitions.state(_CONDITIONS[0], instant) == (value < 100.0)
+    assert transitions.state(_CONDITIONS[0], prices.end) is None
+
+
+def test_conditions_from_options():
+    assert [c.key for c in conditions_from_options({"price_thresholds": "50.5, -1,50.5", "cheapest_share": 25})] == \
+           ["below_minus_1", "below_50_5", "cheapest_25"]
+    assert conditions_from_options({}) == ()
+    with pytest.raises(ValueError):
+        conditions_from_options({"price_thresholds": "50,cheap"})
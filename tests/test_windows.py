@@ -0,0 +1,77 @@
+"""Tests for the searches of the cheapest (or most expensive) windows and quarter-hours."""
+from __future__ import annotations
+
+import math
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from custom_components.omie.series import QuarterHourSeries, QUARTER_HOUR
+from custom_components.omie.windows import cheapest_window, cheapest_quarter_hours
+
+_START = datetime(2026, 6, 14, 22, tzinfo=timezone.utc)
+_NAN = math.nan
+
+# a price missing at index 2, right between the two cheapest ones
+_SERIES = QuarterHourSeries(_START, [50.0, 1.0, _NAN, 2.0, 30.0, 40.0, 90.0, 80.0])
+
+
+def _at(i: int) -> datetime:
+    return _START + i * QUARTER_HOUR
+
+
+@pytest.mark.parametrize("most_expensive, start, average", [(False, 3, 16.0), (True, 6, 85.0)])
+def test_window_skips_gaps(most_expensive, start, average):
+    """Windows that contain a missing price are never chosen, however cheap the prices around it are."""
+    window = cheapest_window(_SERIES, _START, _SERIES.end, 2 * QUARTER_HOUR, most_expensive)
+    assert (window.start, window.end, window.average) == (_at(start), _at(start + 2), average)
+
+
+def test_window_rounds_up():
+    """A duration that is not a whole number of quarter-hours is rounded up."""
+    window = cheapest_window(_SERIES, _START, _SERIES.end, timedelta(minutes=20))
+    assert window.end - window.start == 2 * QUARTER_HOUR
+
+
+@pytest.mark.parametrize("duration", [timedelta(0), 9 * QUARTER_HOUR, 7 * QUARTER_HOUR])
+def test_no_window(duration):
+    """There is no window longer than the search range, none with no quarter-hours, and none without a gap in it."""
+    assert cheapest_window(_SERIES, _START, _SERIES.end, duration) is None
+
+
+def test_window_bounds_outside_series():
+    """The range may start before and end after the known prices, which are all that is searched."""
+    window = cheapest_window(_SERIES, _at(-8), _at(16), 2 * QUARTER_HOUR)
+    assert (window.start, window.average) == (_at(3), 16.0)
+
+    assert cheapest_window(_SERIES, _at(-8), _at(0), QUARTER_HOUR) is None
+    assert cheapest_window(_SERIES, _SERIES.end, _at(16), QUARTER_HOUR) is None
+
+
+def test_window_bounds_within_series():
+    """Quarter-hours outside the range are not searched."""
+    window = cheapest_window(_SERIES, _at(4), _at(8), 2 * QUARTER_HOUR)
+    assert (window.start, window.average) == (_at(4), 35.0)
+
+
+@pytest.mark.parametrize("most_expensive, expected", [(False, [1, 3, 4]), (True, [0, 6, 7])])
+def test_quarter_hours(most_expensive, expected):
+    """The quarter-hours are returned in chronological order, and missing prices are never selected."""
+    found = cheapest_quarter_hours(_SERIES, _START, _SERIES.end, 3, most_expensive)
+    assert found.quarter_hours == [(_at(i), _SERIES.values[i]) for i in expected]
+    assert found.average == round(sum(_SERIES.values[i] for i in expected) / 3, 2)
+
+
+@pytest.mark.parametrize("count", [0, 8, 9])
+def test_too_many_quarter_hours(count):
+    """There are only 7 known prices, and searching for none of them finds nothing."""
+    assert cheapest_quarter_hours(_SERIES, _START, _SERIES.end, count) is None
+
+
+def test_quarter_hours_bounds_outside_series():
+    """The range may start before and end after the known prices, and the padding is never selected."""
+    found = cheapest_quarter_hours(_SERIES, _at(-8), _at(16), 7, most_expensive=True)
+    assert [t for t, _ in found.quarter_hours] == [_at(i) for i in (0, 1, 3, 4, 5, 6, 7)]
+
+    assert cheapest_quarter_hours(_SERIES, _at(-8), _at(0), 1) is None
+    assert cheapest_quarter_hours(_SERIES, _SERIES.end, _at(16), 1) is None